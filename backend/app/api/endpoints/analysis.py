@@ -1,10 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, TypeAdapter
 from typing import List, Optional, Dict, Any
-from app.services.analysis_service import analyze_transcript, generate_questions
+import orjson
+from app.services.analysis_service import analyze_transcript, generate_questions, stream_analysis
 
 router = APIRouter()
 
+# Headers for Server-Sent Events: disable caching and proxy buffering so
+# each event reaches the client as soon as it is yielded
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
 class AnalysisRequest(BaseModel):
     transcript_id: str
     transcript_text: str
@@ -25,11 +31,40 @@ class AnalysisResponse(BaseModel):
     suggested_questions: List[QuestionSuggestion]
     analysis_summary: Optional[str] = None
 
-@router.post("/analyze-transcript", response_model=AnalysisResponse)
+# Built once at import so the batch endpoint validates and serializes its
+# response in one pass rather than going through FastAPI's response_model
+_ANALYSIS_RESPONSE = TypeAdapter(AnalysisResponse)
+
+# Placeholder real-time suggestions, serialized once at import
+_SAMPLE_REAL_TIME_ANALYSIS = orjson.dumps({
+    "suggested_questions": [
+        {"question": "Could you describe the pain level?", "relevance_score": 0.95}
+    ]
+})
+
+@router.post("/analyze-transcript")
 async def analyze_transcript_endpoint(request: AnalysisRequest):
     """
     Analyze a transcript to identify symptoms and generate relevant question suggestions
     using Google Gemini API.
+    Results are streamed as Server-Sent Events: each identified symptom is sent as soon
+    as it is available, followed by the suggested questions and the analysis summary.
+    """
+    async def event_stream():
+        try:
+            async for event in stream_analysis(request.transcript_text):
+                yield b"data: " + orjson.dumps(event) + b"\n\n"
+        except Exception as e:
+            error_event = {"type": "error", "data": f"Analysis failed: {str(e)}"}
+            yield b"data: " + orjson.dumps(error_event) + b"\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.post("/analyze-transcript/batch", response_model=AnalysisResponse)
+async def analyze_transcript_batch_endpoint(request: AnalysisRequest):
+    """
+    Analyze a transcript and return all symptoms and question suggestions in a single
+    response once the full analysis has completed.
     """
     try:
         # Call the analysis service
@@ -41,11 +76,12 @@ async def analyze_transcript_endpoint(request: AnalysisRequest):
             analysis_result.get("identified_symptoms", [])
         )
         
-        return {
+        response = _ANALYSIS_RESPONSE.validate_python({
             "identified_symptoms": analysis_result.get("identified_symptoms", []),
             "suggested_questions": questions,
             "analysis_summary": analysis_result.get("summary")
-        }
+        })
+        return Response(content=_ANALYSIS_RESPONSE.dump_json(response), media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
@@ -56,8 +92,4 @@ async def analyze_real_time(transcript_segment: str):
     For real-time question suggestions during the consultation.
     """
     # Placeholder - this would be implemented with streaming analysis
-    return {
-        "suggested_questions": [
-            {"question": "Could you describe the pain level?", "relevance_score": 0.95}
-        ]
-    } 
\ No newline at end of file
+    return Response(content=_SAMPLE_REAL_TIME_ANALYSIS, media_type="application/json")
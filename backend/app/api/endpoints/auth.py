@@ -1,13 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import time
+import orjson
+from cachetools import TTLCache
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel
 
 # Import the verification dependency and UserRecord model
-from app.core.security import verify_firebase_token
+from app.core.security import oauth2_scheme, token_cache_key, verify_firebase_token
 from firebase_admin.auth import UserRecord # Import UserRecord if you return the full user object
 
 router = APIRouter()
 
+# Serialized /me responses keyed by token hash. Entries are (body, expires_at)
+# tuples, where expires_at is the token's own expiry; the cache TTL caps how
+# long any body is reused.
+_me_response_cache = TTLCache(maxsize=10000, ttl=300)
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -42,7 +50,10 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
 
 # --- New Secured Endpoint Example ---
 @router.get("/me", response_model=dict) # Change response_model if returning UserRecord
-async def read_users_me(current_user: dict = Depends(verify_firebase_token)):
+async def read_users_me(
+    current_user: dict = Depends(verify_firebase_token),
+    token: str = Depends(oauth2_scheme),
+):
     """
     Fetch the profile of the currently logged-in user.
     Requires a valid Firebase ID token in the Authorization header.
@@ -52,8 +63,16 @@ async def read_users_me(current_user: dict = Depends(verify_firebase_token)):
     # If the token is invalid or missing, it raises an HTTPException.
     
     # You can customize the response based on the decoded token payload
-    # For example, return the UID and email:
-    return {"uid": current_user.get("uid"), "email": current_user.get("email")}
+    # For example, return the UID and email. The body only depends on the token,
+    # so it is serialized once and reused while the token is still valid.
+    key = token_cache_key(token)
+    cached = _me_response_cache.get(key)
+    if cached is not None and cached[1] > time.time():
+        return Response(content=cached[0], media_type="application/json")
+    
+    body = orjson.dumps({"uid": current_user.get("uid"), "email": current_user.get("email")})
+    _me_response_cache[key] = (body, current_user.get("exp", 0))
+    return Response(content=body, media_type="application/json")
     # If you changed verify_firebase_token to return UserRecord, you'd access properties like:
     # return {"uid": current_user.uid, "email": current_user.email, "display_name": current_user.display_name}
 # --- End Secured Endpoint Example --- 
\ No newline at end of file
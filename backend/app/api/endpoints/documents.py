@@ -1,10 +1,21 @@
-from fastapi import APIRouter, UploadFile, File, BackgroundTasks, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, UploadFile, File, BackgroundTasks, HTTPException, Response
+from pydantic import BaseModel, TypeAdapter
 from typing import List, Optional, Dict, Any
 import os
+import tempfile
+import aiofiles
+import orjson
+from app.core.ids import new_ulid
 
 router = APIRouter()
 
+# Uploads are copied to disk in 1 MB chunks so a large scan never has to be
+# held in memory in full
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Scratch directory for uploaded documents awaiting processing
+UPLOAD_DIR = os.getenv("DOCUMENT_UPLOAD_DIR", tempfile.gettempdir())
+
 class DocumentAnalysisResult(BaseModel):
     document_id: str
     text_content: str
@@ -12,6 +23,44 @@ class DocumentAnalysisResult(BaseModel):
     confidence: float
     document_type: Optional[str] = None
 
+class DocumentSummary(BaseModel):
+    document_id: str
+    document_type: Optional[str] = None
+    upload_date: str
+    status: str
+
+# Built once at import: validates and serializes whole document lists in a
+# single pass instead of constructing and re-serializing each model
+_DOCUMENT_LIST = TypeAdapter(List[DocumentSummary])
+
+# Placeholder responses, serialized once at import until these endpoints are
+# backed by a database. The analysis body omits the leading document_id field
+# (and its opening brace), which is filled in per request.
+_SAMPLE_ANALYSIS_FIELDS = orjson.dumps({
+    "text_content": "Blood glucose: 110 mg/dL\nHemoglobin A1c: 5.9%",
+    "extracted_data": {
+        "blood_glucose": {
+            "value": 110,
+            "unit": "mg/dL"
+        },
+        "hemoglobin_a1c": {
+            "value": 5.9,
+            "unit": "%"
+        }
+    },
+    "confidence": 0.92,
+    "document_type": "lab_report"
+})[1:]
+
+_SAMPLE_PATIENT_DOCUMENTS = _DOCUMENT_LIST.dump_json(_DOCUMENT_LIST.validate_python([
+    {
+        "document_id": "doc_sample1",
+        "document_type": "lab_report",
+        "upload_date": "2023-10-15T14:30:00Z",
+        "status": "processed"
+    }
+]))
+
 @router.post("/upload", response_model=dict)
 async def upload_document(
     background_tasks: BackgroundTasks,
@@ -23,17 +72,18 @@ async def upload_document(
     Upload a medical document (like a lab report, prescription, etc.) for OCR and analysis.
     This endpoint handles the file upload and queues the OCR and analysis process.
     """
-    # Generate unique ID for this document
-    document_id = f"doc_{os.urandom(8).hex()}"
+    # Generate unique, time-sortable ID for this document
+    document_id = f"doc_{new_ulid()}"
     
     # Save uploaded file temporarily
     file_extension = file.filename.split(".")[-1] if "." in file.filename else "jpg"
-    temp_file_path = f"temp_{document_id}.{file_extension}"
+    temp_file_path = os.path.join(UPLOAD_DIR, f"temp_{document_id}.{file_extension}")
     
     try:
-        with open(temp_file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # Write through aiofiles so disk I/O doesn't block the event loop
+        async with aiofiles.open(temp_file_path, "wb") as buffer:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                await buffer.write(chunk)
         
         # Background task would process the document with OCR
         # For now this is just a placeholder
@@ -51,35 +101,17 @@ async def get_document_analysis(document_id: str):
     """
     Get the results of a document analysis.
     """
-    # This is a placeholder - actual implementation would retrieve from database
-    return {
-        "document_id": document_id,
-        "text_content": "Blood glucose: 110 mg/dL\nHemoglobin A1c: 5.9%",
-        "extracted_data": {
-            "blood_glucose": {
-                "value": 110,
-                "unit": "mg/dL"
-            },
-            "hemoglobin_a1c": {
-                "value": 5.9,
-                "unit": "%"
-            }
-        },
-        "confidence": 0.92,
-        "document_type": "lab_report"
-    }
+    # This is a placeholder - actual implementation would retrieve from database.
+    # Only the document ID varies, so it is spliced into the prebuilt body.
+    return Response(
+        content=b'{"document_id":' + orjson.dumps(document_id) + b"," + _SAMPLE_ANALYSIS_FIELDS,
+        media_type="application/json"
+    )
 
-@router.get("/patient/{patient_id}", response_model=List[dict])
+@router.get("/patient/{patient_id}", response_model=List[DocumentSummary])
 async def get_patient_documents(patient_id: str):
     """
     Get all documents uploaded for a specific patient.
     """
     # This is a placeholder - actual implementation would retrieve from database
-    return [
-        {
-            "document_id": "doc_sample1",
-            "document_type": "lab_report",
-            "upload_date": "2023-10-15T14:30:00Z",
-            "status": "processed"
-        }
-    ] 
\ No newline at end of file
+    return Response(content=_SAMPLE_PATIENT_DOCUMENTS, media_type="application/json")
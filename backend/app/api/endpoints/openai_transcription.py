@@ -1,14 +1,31 @@
 import logging
+from contextlib import asynccontextmanager
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from uuid import uuid4
 
-from app.services.openai_service import process_audio_stream
-from app.ssl_fix import apply_ssl_fixes
+from app.services.openai_service import create_connection_pool, process_audio_stream
+from app.core.websocket import send_json_fast
+from app.core.ids import new_ulid
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+@asynccontextmanager
+async def lifespan(app):
+    """
+    Pre-open OpenAI transcription connections, when configured. This is the
+    router's lifespan, so it only runs in apps that mount this endpoint.
+    """
+    app.state.openai_pool = create_connection_pool()
+    if not app.state.openai_pool:
+        yield
+        return
+    app.state.openai_pool.warm_up()
+    try:
+        yield
+    finally:
+        await app.state.openai_pool.close()
+
+router = APIRouter(lifespan=lifespan)
 
 @router.websocket("/transcribe")
 async def openai_transcribe_websocket(websocket: WebSocket):
@@ -17,32 +34,31 @@ async def openai_transcribe_websocket(websocket: WebSocket):
     The client sends audio data as binary messages, and receives transcription results.
     """
     # Generate a unique ID for this consultation
-    consultation_id = f"openai-consultation-{uuid4()}"
+    consultation_id = f"openai-consultation-{new_ulid()}"
     
     try:
-        # Apply SSL fixes before accepting the connection
-        apply_ssl_fixes()
-        
         # Accept the WebSocket connection
         await websocket.accept()
         logger.info(f"WebSocket connection established for OpenAI transcription: {consultation_id}")
         
         # Send a ready message to the client
-        await websocket.send_json({
+        await send_json_fast(websocket, {
             "status": "ready", 
             "message": "OpenAI transcription service ready",
             "consultation_id": consultation_id
         })
         
         # Process the audio stream using the OpenAI service
-        await process_audio_stream(websocket, consultation_id)
+        await process_audio_stream(
+            websocket, consultation_id, getattr(websocket.app.state, "openai_pool", None)
+        )
         
     except WebSocketDisconnect:
         logger.info(f"WebSocket disconnected for OpenAI transcription: {consultation_id}")
     except Exception as e:
         logger.error(f"Error in OpenAI transcription WebSocket: {str(e)}", exc_info=True)
         try:
-            await websocket.send_json({
+            await send_json_fast(websocket, {
                 "event": "error",
                 "message": f"Server error: {str(e)}",
                 "consultation_id": consultation_id
@@ -2,101 +2,155 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
 import logging
 import asyncio # Need asyncio for sleep
-from app.services.deepgram_service import DeepgramService
-from app.config import get_settings
-import base64
+import json
+from uuid import uuid4
+from app.services.deepgram_service import DeepgramService, get_deepgram_service
+from app.core.websocket import send_json_fast
 
-# Basic logging setup
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# In-memory storage of active WebSocket connections and their Deepgram connections
+# In-memory storage of active WebSocket connections and their Deepgram connections,
+# keyed by a per-connection UUID. This registry is per worker process.
 active_connections = {}
 
+# Small client audio frames are coalesced before being forwarded to Deepgram:
+# once audio arrives it is sent within 25 ms, or right away if 8 KB has
+# already built up by the time the sender gets to it
+AUDIO_FLUSH_INTERVAL = 0.025
+AUDIO_FLUSH_BYTES = 8192
+
+# Pre-serialized status message sent when Deepgram closes the stream
+CLOSED_PAYLOAD = '{"status":"closed"}'
+
 @router.websocket("/transcribe")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(
+    websocket: WebSocket,
+    deepgram_service: DeepgramService = Depends(get_deepgram_service),
+):
     await websocket.accept()
     
-    # Create a unique ID for this connection
-    connection_id = id(websocket)
-    logger.info(f"New WebSocket connection established: {connection_id}")
+    # Create a unique ID for this connection. id(websocket) is not safe here:
+    # CPython reuses object ids after garbage collection.
+    connection_id = uuid4().hex
+    logger.info("New WebSocket connection established: %s", connection_id)
     
     # Store the WebSocket connection
     active_connections[connection_id] = {"websocket": websocket, "deepgram_connection": None}
     
-    # Get settings
-    settings = get_settings()
+    # Audio received from the client but not yet sent to Deepgram. The
+    # sender task only wakes when `audio_pending` is set.
+    pending_audio = bytearray()
+    audio_pending = asyncio.Event()
+    closing = False
+    flush_task = None
+    
+    async def forward_audio(connection):
+        """
+        Send buffered audio to Deepgram until the connection is closing and
+        everything received has been sent.
+        The sync live client's send blocks (it takes a lock), so every send
+        runs in a worker thread rather than on the event loop.
+        """
+        while True:
+            await audio_pending.wait()
+            # Give small frames a moment to add up to a larger packet
+            if not closing and len(pending_audio) < AUDIO_FLUSH_BYTES:
+                await asyncio.sleep(AUDIO_FLUSH_INTERVAL)
+            audio_pending.clear()
+            if pending_audio:
+                packet = bytes(pending_audio)
+                pending_audio.clear()
+                try:
+                    await asyncio.to_thread(connection.send, packet)
+                except Exception as e:
+                    logger.error("Error sending buffered audio to Deepgram: %s", e)
+            # Audio may have arrived while the last send was in flight
+            if closing and not pending_audio:
+                return
     
     # Create a callback function to handle transcription results
     async def transcription_callback(transcript):
         try:
+            # The payload shapes are fixed, so build the JSON text directly
+            # and only escape the transcript string itself
             if transcript.startswith("TRANSCRIPTION_ERROR"):
-                await websocket.send_json({"error": transcript})
+                payload = f'{{"error":{json.dumps(transcript)}}}'
             elif transcript == "TRANSCRIPTION_CLOSED":
-                await websocket.send_json({"status": "closed"})
+                payload = CLOSED_PAYLOAD
             else:
-                await websocket.send_json({"transcript": transcript})
+                payload = f'{{"transcript":{json.dumps(transcript)}}}'
+            await websocket.send_text(payload)
         except Exception as e:
-            logger.error(f"Error in transcription callback: {str(e)}")
+            logger.error("Error in transcription callback: %s", e)
     
     try:
-        # Initialize Deepgram service
-        deepgram_service = DeepgramService()
-        
         # Start Deepgram live transcription connection
         connection, error = await deepgram_service.process_audio_stream(transcription_callback)
         
         if error:
-            logger.error(f"Failed to start Deepgram connection: {error}")
-            await websocket.send_json({"error": f"Failed to initialize transcription: {error}"})
+            logger.error("Failed to start Deepgram connection: %s", error)
+            await send_json_fast(websocket, {"error": f"Failed to initialize transcription: {error}"})
             return
         
         # Store the Deepgram connection
         active_connections[connection_id]["deepgram_connection"] = connection
         
+        # Forward buffered audio from a separate task
+        flush_task = asyncio.create_task(forward_audio(connection))
+        
         # Send a message indicating that transcription is ready
-        await websocket.send_json({"status": "ready", "message": "Transcription is ready. Send audio data."})
+        await send_json_fast(websocket, {"status": "ready", "message": "Transcription is ready. Send audio data."})
         
-        # Keep the connection open and process incoming audio data
+        # Keep the connection open and process incoming audio data.
+        # Audio arrives as binary frames (raw PCM/Opus) and is forwarded to
+        # Deepgram untouched; text frames are only used for heartbeats.
         while True:
-            # Receive message from WebSocket
-            data = await websocket.receive_text()
+            message = await websocket.receive()
             
-            # Check if the message is a ping
-            if data == "ping":
-                await websocket.send_text("pong")
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            
+            audio_data = message.get("bytes")
+            if audio_data is None:
+                # Check if the message is a ping
+                if message.get("text") == "ping":
+                    await websocket.send_text("pong")
                 continue
             
-            try:
-                # Assuming data is base64 encoded audio
-                audio_data = base64.b64decode(data)
-                
-                # Send audio data to Deepgram
-                connection.send(audio_data)
-            except Exception as e:
-                logger.error(f"Error processing audio data: {str(e)}")
-                await websocket.send_json({"error": f"Error processing audio: {str(e)}"})
+            # Buffer the audio and wake the sender
+            pending_audio += audio_data
+            audio_pending.set()
     
     except WebSocketDisconnect:
-        logger.info(f"WebSocket disconnected: {connection_id}")
+        logger.info("WebSocket disconnected: %s", connection_id)
     
     except Exception as e:
-        logger.error(f"Error in WebSocket connection: {str(e)}")
+        logger.error("Error in WebSocket connection: %s", e)
         try:
-            await websocket.send_json({"error": f"Server error: {str(e)}"})
+            await send_json_fast(websocket, {"error": f"Server error: {str(e)}"})
         except:
             pass
     
     finally:
+        if flush_task:
+            # Let the sender send any audio still waiting in the buffer
+            closing = True
+            audio_pending.set()
+            try:
+                await asyncio.wait_for(flush_task, timeout=2.0)
+            except Exception as e:
+                logger.warning("Could not flush remaining audio to Deepgram: %s", e)
+        
         # Clean up Deepgram connection if it exists
         connection_info = active_connections.pop(connection_id, None)
         if connection_info and connection_info.get("deepgram_connection"):
             try:
-                await connection_info["deepgram_connection"].finish()
-                logger.info(f"Closed Deepgram connection for {connection_id}")
+                # finish() on the sync live client blocks until its threads exit
+                await asyncio.to_thread(connection_info["deepgram_connection"].finish)
+                logger.info("Closed Deepgram connection for %s", connection_id)
             except Exception as e:
-                logger.error(f"Error closing Deepgram connection: {str(e)}")
+                logger.error("Error closing Deepgram connection: %s", e)
 
 websocket_router = router 
\ No newline at end of file
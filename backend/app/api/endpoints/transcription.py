@@ -1,6 +1,5 @@
 import logging
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, status, WebSocket, WebSocketDisconnect
-from fastapi.responses import JSONResponse
 from typing import Dict, Any, List, Optional
 from pydantic import BaseModel
 from uuid import uuid4
@@ -13,6 +12,7 @@ from uuid import uuid4
 # from app.services.gemini_service import transcribe_audio_gemini
 
 from app.services.deepgram_service import transcribe_audio_file, process_audio_stream
+from app.services.deepgram_pool import DeepgramConnectionPool
 
 import asyncio
 from deepgram import (
@@ -22,45 +22,197 @@ from deepgram import (
     LiveOptions,
 )
 import os
-from dotenv import load_dotenv
 
 # Import the new AI analysis service
-from app.services.ai_analysis import analyze_transcript_chunk
+from app.services.ai_analysis import analyze_transcript_chunk, stream_transcript_analysis
+from app.core.websocket import enqueue_message, enqueue_update, send_json_fast
+from app.core.config import settings
 
-# Load environment variables
-load_dotenv()
-
-# Get API key from environment
-DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
+# Get API key from the shared application settings
+DEEPGRAM_API_KEY = settings.DEEPGRAM_API_KEY
 
 # Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Deepgram client configuration
+# Deepgram client configuration. Keepalive stops Deepgram from closing pooled
+# connections that are open but not yet receiving audio.
 config: DeepgramClientOptions = DeepgramClientOptions(
-    verbose=logging.DEBUG # Optional: Log Deepgram SDK details
+    verbose=logging.WARNING, # Raise to logging.DEBUG to trace Deepgram SDK calls
+    options={"keepalive": "true"},
+)
+
+# Deepgram options for the live stream, shared by every connection
+LIVE_OPTIONS = LiveOptions(
+    model="nova-2",
+    language="en-US",
+    smart_format=True,
+    diarize=True,
+    encoding="linear16",
+    sample_rate=16000,
+    channels=1,
 )
 
-# --- Input Validation ---
-if not DEEPGRAM_API_KEY:
-    logger.error("DEEPGRAM_API_KEY not found in environment variables.")
-    # In a real app, you might raise an exception or handle this differently
-    # For now, we'll allow it to proceed but Deepgram connection will fail.
+# Number of live connections kept open ahead of new WebSocket clients
+DEEPGRAM_PREWARM_CONNECTIONS = int(os.getenv("DEEPGRAM_PREWARM_CONNECTIONS", "2"))
+
+def create_deepgram_pool() -> DeepgramConnectionPool | None:
+    """
+    Create the Deepgram client and its pool of pre-opened live connections.
+    Called from the application lifespan, which stores the result on
+    `app.state.deepgram_pool`.
+
+    Returns:
+        The connection pool, or None if Deepgram is not configured
+    """
+    if not DEEPGRAM_API_KEY:
+        logger.error("DEEPGRAM_API_KEY not found in environment variables.")
+        # Allow the app to run; the transcription WebSocket reports the error
+        logger.warning("Deepgram client not initialized due to missing API key.")
+        return None
 
-# Initialize Deepgram client only if the key exists
-deepgram: DeepgramClient | None = None
-if DEEPGRAM_API_KEY:
     try:
         deepgram = DeepgramClient(DEEPGRAM_API_KEY, config)
         logger.info("Deepgram client initialized.")
     except Exception as e:
         logger.error(f"Failed to initialize Deepgram client: {e}", exc_info=True)
-else:
-    logger.warning("Deepgram client not initialized due to missing API key.")
+        return None
+
+    return DeepgramConnectionPool(deepgram, LIVE_OPTIONS, DEEPGRAM_PREWARM_CONNECTIONS)
 
 router = APIRouter()
 
+# Maximum number of outbound messages buffered per WebSocket client. When a slow
+# client lets the queue fill up, the oldest message is dropped.
+OUTBOUND_QUEUE_SIZE = 256
+
+# Client audio chunks waiting to be sent to Deepgram. If Deepgram falls behind
+# the oldest chunks are dropped: losing a little audio is better than building
+# up a backlog that delays every transcript after it.
+AUDIO_QUEUE_SIZE = 50
+
+# Small audio chunks are joined into packets of at least this size (~100 ms of
+# 16 kHz linear16) before going to Deepgram, waiting at most AUDIO_FLUSH_INTERVAL
+# seconds for a packet to fill up
+AUDIO_COALESCE_BYTES = 3200
+AUDIO_FLUSH_INTERVAL = 0.1
+
+# How often each connection's writer logs its outbound message counts (seconds)
+STATS_LOG_INTERVAL = 10.0
+
+# Stream each transcript analysis from Gemini, sending symptoms to the client
+# as they arrive. Set to false to use batched (non-streaming) analysis instead.
+STREAM_ANALYSIS = os.getenv("GEMINI_STREAM_ANALYSIS", "true").lower() == "true"
+
+class _ConnectionLogAdapter(logging.LoggerAdapter):
+    """Prefixes log messages with the WebSocket connection ID."""
+
+    def process(self, msg, kwargs):
+        return f"[{self.extra['cid']}] {msg}", kwargs
+
+def _coalesce_messages(messages: List[dict]) -> List[dict]:
+    """
+    Drop interim transcripts that a later transcript for the same speaker in
+    the batch supersedes, so only the latest interim per speaker is sent.
+    Final transcripts and other messages are always kept, in order.
+    """
+    kept: List[dict] = []
+    superseded_speakers = set()
+    for message in reversed(messages):
+        if message.get("type") == "transcript":
+            speaker = message.get("speaker")
+            if not message.get("is_final") and speaker in superseded_speakers:
+                continue
+            superseded_speakers.add(speaker)
+        kept.append(message)
+    kept.reverse()
+    return kept
+
+async def _outbound_writer(websocket: WebSocket, queue: asyncio.Queue, log: logging.LoggerAdapter):
+    """
+    Send queued messages to the client. Everything queued while the previous
+    send was in flight goes out together as a single batch frame.
+    Message and frame counts are logged every STATS_LOG_INTERVAL seconds
+    rather than per message. Queueing None sends whatever was queued before
+    it and stops the task.
+    """
+    loop = asyncio.get_running_loop()
+    sent_messages = sent_frames = 0
+    last_report = loop.time()
+    while True:
+        messages = [await queue.get()]
+        while not queue.empty():
+            messages.append(queue.get_nowait())
+
+        stop = None in messages
+        if stop:
+            messages = messages[:messages.index(None)]
+
+        messages = _coalesce_messages(messages)
+        try:
+            if len(messages) == 1:
+                await send_json_fast(websocket, messages[0])
+            elif messages:
+                await send_json_fast(websocket, {"type": "batch", "items": messages})
+        except Exception as e:
+            log.warning("Stopping outbound writer, failed to send to client: %s", e)
+            return
+        if stop:
+            return
+
+        sent_messages += len(messages)
+        sent_frames += 1
+        now = loop.time()
+        if now - last_report >= STATS_LOG_INTERVAL:
+            log.info("Sent %d messages in %d frames over the last %.0f s", sent_messages, sent_frames, now - last_report)
+            sent_messages = sent_frames = 0
+            last_report = now
+
+async def _forward_audio(dg_connection, audio_queue: asyncio.Queue):
+    """
+    Send client audio to Deepgram, joining small chunks into ~100 ms packets.
+    Queueing None sends whatever is still buffered and stops the task.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        data = await audio_queue.get()
+        if data is None:
+            return
+        if len(data) < AUDIO_COALESCE_BYTES:
+            packet = bytearray(data)
+            deadline = loop.time() + AUDIO_FLUSH_INTERVAL
+            while len(packet) < AUDIO_COALESCE_BYTES:
+                try:
+                    data = await asyncio.wait_for(audio_queue.get(), deadline - loop.time())
+                except asyncio.TimeoutError:
+                    break
+                if data is None:
+                    await dg_connection.send(bytes(packet))
+                    return
+                packet += data
+            data = bytes(packet)
+        await dg_connection.send(data)
+
+# Audio MIME types accepted by the upload endpoints (parameters such as
+# ";codecs=opus" are stripped before the lookup)
+ACCEPTED_AUDIO = frozenset({
+    "audio/wav", "audio/x-wav", "audio/webm", "audio/mpeg", "audio/mp3",
+    "audio/ogg", "audio/flac", "audio/mp4", "audio/x-m4a", "audio/aac",
+})
+
+async def accepted_audio_file(file: UploadFile = File(...)) -> UploadFile:
+    """
+    FastAPI dependency that returns the uploaded file if it is a supported audio type.
+
+    Raises:
+        HTTPException (400): If the content type is not in ACCEPTED_AUDIO
+    """
+    content_type = (file.content_type or "").split(";", 1)[0].strip().lower()
+    if content_type not in ACCEPTED_AUDIO:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File must be an audio file, got {file.content_type}")
+    return file
+
 # Define the necessary response models
 class DirectTranscriptionResponse(BaseModel):
     transcription: Optional[str] = None
@@ -84,20 +236,13 @@ class DirectTranscriptionResponse(BaseModel):
 
 @router.post("/direct", response_model=DirectTranscriptionResponse)
 async def transcribe_audio_direct(
-    file: UploadFile = File(...),
+    file: UploadFile = Depends(accepted_audio_file),
 ):
     """
     Transcribes an uploaded audio file directly using the Deepgram API.
     Receives an audio file and returns the transcription text.
     """
     try:
-        # Check file type
-        content_type = file.content_type or ""
-        if not content_type.startswith("audio/"):
-            raise HTTPException(
-                status_code=400, 
-                detail=f"File must be an audio file, got {content_type}")
-        
         # Process with Deepgram
         result = await transcribe_audio_file(file)
         
@@ -140,7 +285,7 @@ async def transcribe_audio_direct(
 
 @router.post("/upload", response_model=Dict[str, Any])
 async def upload_audio(
-    file: UploadFile = File(...),
+    file: UploadFile = Depends(accepted_audio_file),
 ):
     """
     Upload an audio file for transcription.
@@ -154,17 +299,7 @@ async def upload_audio(
     Returns:
     - A dictionary containing transcription results
     """
-    if not file:
-        raise HTTPException(status_code=400, detail="No file provided")
-    
     try:
-        # Check file type
-        content_type = file.content_type or ""
-        if not content_type.startswith("audio/"):
-            raise HTTPException(
-                status_code=400, 
-                detail=f"File must be an audio file, got {content_type}")
-        
         # Process with Deepgram
         result = await transcribe_audio_file(file)
         
@@ -179,63 +314,107 @@ async def upload_audio(
 async def transcribe_stream_endpoint(websocket: WebSocket):
     """Handles the WebSocket connection for real-time transcription and AI analysis."""
     await websocket.accept()
-    logger.info("WebSocket connection accepted.")
-
-    if not deepgram:
-        logger.error("Deepgram client not available. Cannot start transcription.")
-        await websocket.send_json({"type": "error", "message": "Deepgram client not configured on server."})
+    # Short per-connection ID, bound once to the logger for this connection
+    conn_id = uuid4().hex[:8]
+    log = _ConnectionLogAdapter(logger, {"cid": conn_id})
+    log.info("WebSocket connection accepted.")
+
+    # Created once by the application lifespan and shared by all connections
+    deepgram_pool: DeepgramConnectionPool | None = getattr(websocket.app.state, "deepgram_pool", None)
+    if not deepgram_pool:
+        log.error("Deepgram client not available. Cannot start transcription.")
+        await send_json_fast(websocket, {"type": "error", "message": "Deepgram client not configured on server."})
         await websocket.close(code=1011) # Internal Error
         return
 
     dg_connection = None # Initialize connection variable
     # --- Variables for AI Analysis ---
-    full_transcript_text = "" # Accumulate transcript here
-    last_analyzed_length = 0
+    segments: List[tuple[int, str]] = [] # Final (speaker, text) segments, in order
+    last_analyzed_seg_idx = 0 # Segments before this index have been analyzed
     ANALYSIS_THRESHOLD = 300 # Analyze every N characters of new transcript
-    analysis_task = None # To hold the background analysis task
+    CONTEXT_TAIL = 20 # Already-analyzed segments re-sent as context with new ones
+    # A single analyzer task per connection runs analyses one at a time; the
+    # Deepgram handlers only wake it up
+    analysis_wakeup = asyncio.Event()
+    analysis_flush = False # Analyze any unanalyzed text, even below the threshold
+    analysis_stopping = False
+    analyzer_task = None
+    # Messages for the client are queued and sent by a separate writer task, so
+    # Deepgram callbacks never wait on the client's socket
+    out_queue: asyncio.Queue = asyncio.Queue(maxsize=OUTBOUND_QUEUE_SIZE)
+    writer_task = None
+    audio_queue: asyncio.Queue = asyncio.Queue(maxsize=AUDIO_QUEUE_SIZE)
+    forward_task = None
+    audio_dropped = 0 # Audio chunks discarded because Deepgram fell behind
 
     try:
-        # Configure Deepgram options for the live stream
-        options = LiveOptions(
-            model="nova-2",
-            language="en-US",
-            smart_format=True,
-            diarize=True,
-            encoding="linear16",
-            sample_rate=16000,
-            channels=1,
-        )
-        logger.info(f"Attempting to connect to Deepgram with options: {options}")
-
-        dg_connection = deepgram.listen.asynclive.v("1")
-
         # --- Define Helper for Analysis ---
-        async def run_analysis(current_transcript: str):
-            nonlocal last_analyzed_length
-            logger.info(f"Running AI analysis on transcript (length: {len(current_transcript)})...")
-            analysis_result = await analyze_transcript_chunk(current_transcript)
+        def unanalyzed_chars() -> int:
+            return sum(len(text) for _, text in segments[last_analyzed_seg_idx:])
+
+        def snapshot_for_analysis():
+            """Return (new segments, preceding context segments) as immutable snapshots."""
+            context_start = max(0, last_analyzed_seg_idx - CONTEXT_TAIL)
+            return (
+                tuple(segments[last_analyzed_seg_idx:]),
+                tuple(segments[context_start:last_analyzed_seg_idx]),
+            )
+
+        async def run_analysis(
+            delta_segments: tuple[tuple[int, str], ...],
+            context_tail: tuple[tuple[int, str], ...],
+        ):
+            nonlocal last_analyzed_seg_idx
+            # Send the new segments plus a bounded tail of earlier ones for context,
+            # so the prompt size doesn't grow with the length of the session
+            current_transcript = "\n".join(
+                f"Speaker {speaker + 1}: {text}" for speaker, text in context_tail + delta_segments
+            )
+            log.info("Running AI analysis on transcript (length: %d)...", len(current_transcript))
+            if STREAM_ANALYSIS:
+                # Push each symptom as soon as Gemini has produced it, ahead of the full analysis
+                symptoms = []
+                analysis_result = None
+                async for kind, data in stream_transcript_analysis(current_transcript):
+                    if kind == "symptom":
+                        symptoms.append(data)
+                        enqueue_update(out_queue, {"type": "analysis_partial", "data": {"symptoms": list(symptoms)}})
+                    else:
+                        analysis_result = data
+            else:
+                analysis_result = await analyze_transcript_chunk(current_transcript)
             if analysis_result:
-                logger.info(f"AI analysis successful: {analysis_result}")
-                try:
-                    logger.info(f"Attempting to send analysis results via WebSocket...")
-                    await websocket.send_json({"type": "analysis", "data": analysis_result})
-                    logger.info("Successfully sent analysis results via WebSocket.")
-                    # Update last analyzed length *after* successful send
-                    last_analyzed_length = len(current_transcript)
-                except WebSocketDisconnect:
-                     logger.warning("WebSocket disconnected during AI analysis result sending.")
-                except Exception as send_err:
-                    logger.error(f"Failed to send analysis result over WebSocket: {send_err}")
+                log.debug("AI analysis successful: %s", analysis_result)
+                enqueue_update(out_queue, {"type": "analysis", "data": analysis_result})
+                log.info("Queued analysis results for the client.")
+                # Update last analyzed index *after* the result is handed off. Only one
+                # analysis runs at a time, so nothing else has moved it meanwhile.
+                last_analyzed_seg_idx += len(delta_segments)
             else:
-                logger.warning("AI analysis returned None or failed.")
+                log.warning("AI analysis returned None or failed.")
             # Indicate task completion (or handle errors if needed)
 
+        async def analyzer_loop():
+            nonlocal analysis_flush
+            while True:
+                await analysis_wakeup.wait()
+                analysis_wakeup.clear()
+                if analysis_stopping:
+                    return
+                if not (analysis_flush or unanalyzed_chars() >= ANALYSIS_THRESHOLD):
+                    continue
+                analysis_flush = False
+                if len(segments) > last_analyzed_seg_idx:
+                    try:
+                        await run_analysis(*snapshot_for_analysis())
+                    except Exception as e:
+                        log.error(f"AI analysis failed: {e}", exc_info=True)
+
         # --- Define Deepgram Event Handlers ---
         async def on_message(self, result, **kwargs):
-            nonlocal full_transcript_text, last_analyzed_length, analysis_task
             try:
                 if not result or not result.channel or not result.channel.alternatives:
-                    logger.warning("Received empty or malformed transcript result from Deepgram.")
+                    log.warning("Received empty or malformed transcript result from Deepgram.")
                     return
 
                 sentence = result.channel.alternatives[0].transcript
@@ -253,55 +432,56 @@ async def transcribe_stream_endpoint(websocket: WebSocket):
                     "speaker": speaker,
                     "text": sentence.strip()
                 }
-                await websocket.send_json(message_to_send)
-                logger.info(f"Sent to client: Speaker {speaker}: {sentence.strip()} (Final: {is_final})")
+                enqueue_update(out_queue, message_to_send)
+                log.debug("Queued for client: Speaker %s: %s (Final: %s)", speaker, message_to_send["text"], is_final)
 
                 # --- AI Analysis Trigger ---
                 if is_final and sentence.strip():
                     # Append final transcript segment with speaker info
-                    full_transcript_text += f"Speaker {speaker + 1}: {sentence.strip()}\n"
+                    segments.append((speaker, sentence.strip()))
+                    new_chars = unanalyzed_chars()
                     
                     # --> Add log to check threshold condition
-                    logger.debug(f"Checking analysis threshold: Current length={len(full_transcript_text)}, Last analyzed={last_analyzed_length}, Threshold={ANALYSIS_THRESHOLD}")
+                    log.debug("Checking analysis threshold: New characters=%d, Segments=%d, Threshold=%d", new_chars, len(segments), ANALYSIS_THRESHOLD)
 
-                    # Check if enough new text has accumulated and no analysis is running
-                    if len(full_transcript_text) - last_analyzed_length >= ANALYSIS_THRESHOLD and (analysis_task is None or analysis_task.done()):
-                        # Launch analysis in the background
-                        logger.info(f"Threshold reached ({len(full_transcript_text) - last_analyzed_length} >= {ANALYSIS_THRESHOLD}). Triggering AI analysis task.")
-                        analysis_task = asyncio.create_task(run_analysis(full_transcript_text))
-                        # Don't update last_analyzed_length here; update it after analysis succeeds
-                    elif analysis_task and not analysis_task.done():
-                        logger.debug("AI analysis already in progress, skipping trigger.")
+                    # Wake the analyzer once enough new text has accumulated. If an
+                    # analysis is already running, it re-checks when that one finishes.
+                    if new_chars >= ANALYSIS_THRESHOLD:
+                        log.info("Threshold reached (%d >= %d). Triggering AI analysis.", new_chars, ANALYSIS_THRESHOLD)
+                        analysis_wakeup.set()
 
             except WebSocketDisconnect:
-                 logger.warning("WebSocket disconnected during message processing.")
+                 log.warning("WebSocket disconnected during message processing.")
                  # Allow the main loop to handle cleanup
                  raise
             except Exception as e:
-                logger.error(f"Error processing Deepgram message or triggering analysis: {e}", exc_info=True)
-                try:
-                   await websocket.send_json({"type": "error", "message": "Error processing transcript."})
-                except Exception:
-                    pass
+                log.error(f"Error processing Deepgram message or triggering analysis: {e}", exc_info=True)
+                enqueue_update(out_queue, {"type": "error", "message": "Error processing transcript."})
 
         async def on_metadata(self, metadata, **kwargs):
-            logger.info(f"Deepgram metadata received: {metadata}")
+            log.debug("Deepgram metadata received: %s", metadata)
 
         async def on_utterance_end(self, utterance_end, **kwargs):
-            nonlocal analysis_task, full_transcript_text
-            logger.info(f"Deepgram utterance end received: {utterance_end}")
-            # Option: Trigger a final analysis run if not already running and there's text
-            if full_transcript_text and (analysis_task is None or analysis_task.done()):
-                 logger.info("Triggering final analysis on utterance end.")
-                 logger.info("Starting final analysis task on utterance end...")
-                 analysis_task = asyncio.create_task(run_analysis(full_transcript_text))
+            nonlocal analysis_flush
+            log.debug("Deepgram utterance end received: %s", utterance_end)
+            # Analyze whatever text is left, regardless of the threshold
+            if len(segments) > last_analyzed_seg_idx:
+                 log.info("Triggering final analysis on utterance end.")
+                 analysis_flush = True
+                 analysis_wakeup.set()
 
         async def on_error(self, error, **kwargs):
-            logger.error(f"Deepgram error received: {error}")
-            try:
-                await websocket.send_json({"type": "error", "message": f"Transcription service error: {error.get('message', 'Unknown error')}"})
-            except Exception:
-                pass # Ignore if sending fails
+            log.error(f"Deepgram error received: {error}")
+            enqueue_update(out_queue, {"type": "error", "message": f"Transcription service error: {error.get('message', 'Unknown error')}"})
+
+        # Start the writer before any Deepgram callback can queue a message
+        writer_task = asyncio.create_task(_outbound_writer(websocket, out_queue, log))
+        analyzer_task = asyncio.create_task(analyzer_loop())
+
+        # Take an already-started connection from the pool (or open one now).
+        # No audio has been sent on it yet, so handlers can be attached after start.
+        dg_connection = await deepgram_pool.acquire()
+        log.info("Deepgram connection started.")
 
         # Assign handlers
         dg_connection.on(LiveTranscriptionEvents.Transcript, on_message)
@@ -309,78 +489,96 @@ async def transcribe_stream_endpoint(websocket: WebSocket):
         dg_connection.on(LiveTranscriptionEvents.UtteranceEnd, on_utterance_end)
         dg_connection.on(LiveTranscriptionEvents.Error, on_error)
 
-        # Start the connection
-        await dg_connection.start(options)
-        logger.info("Deepgram connection started.")
-
         # Send a ready message to the client
-        await websocket.send_json({"type": "status", "message": "Transcription service ready"})
+        await send_json_fast(websocket, {"type": "status", "message": "Transcription service ready"})
+
+        # Audio is handed to a forwarding task so a slow Deepgram send doesn't
+        # hold up reading the next frame from the client
+        forward_task = asyncio.create_task(_forward_audio(dg_connection, audio_queue))
 
         # --- Receive Audio Data Loop ---
-        while True:
+        # iter_bytes() ends the loop when the client disconnects
+        try:
+            async for data in websocket.iter_bytes():
+                # Surface any Deepgram send failure from the forwarding task
+                if forward_task.done():
+                    forward_task.result()
+
+                # Queue the audio data for Deepgram, never waiting on a slow send
+                if enqueue_message(audio_queue, data):
+                    audio_dropped += 1
+                    if audio_dropped == 1:
+                        log.warning("Deepgram is falling behind; dropping oldest audio.")
+            log.info("WebSocket disconnected by client.")
+        except Exception as e:
+            log.error(f"Error receiving/sending audio data: {e}", exc_info=True)
+            # Try to tell the client before the connection is cleaned up
             try:
-                # Receive binary audio data from the client
-                data = await websocket.receive_bytes()
-                # logger.debug(f"Received {len(data)} bytes from client") # Very verbose
-
-                # Send the audio data to Deepgram
-                # Use the asynchronous send method
-                await dg_connection.send(data)
-
-            except WebSocketDisconnect:
-                logger.info("WebSocket disconnected by client.")
-                break # Exit the loop
-            except Exception as e:
-                logger.error(f"Error receiving/sending audio data: {e}", exc_info=True)
-                # Decide if the error is fatal or recoverable
-                # For now, we'll try to send an error and break
-                try:
-                    await websocket.send_json({"type": "error", "message": "Server error processing audio."})
-                except Exception:
-                    pass # Ignore if sending fails
-                break # Exit the loop
+                await send_json_fast(websocket, {"type": "error", "message": "Server error processing audio."})
+            except Exception:
+                pass # Ignore if sending fails
 
     except Exception as e:
-        logger.error(f"Error during WebSocket setup or main loop: {e}", exc_info=True)
+        log.error(f"Error during WebSocket setup or main loop: {e}", exc_info=True)
         try:
             # Attempt to send a final error message if the socket is still open
-            await websocket.send_json({"type": "error", "message": f"An internal server error occurred: {e}"}) 
+            await send_json_fast(websocket, {"type": "error", "message": f"An internal server error occurred: {e}"}) 
         except Exception:
             pass # Ignore if socket is already closed
 
     finally:
-        logger.info("Cleaning up WebSocket connection...")
-        # Wait for any pending analysis task to finish (with a timeout)
-        if analysis_task and not analysis_task.done():
-            logger.info("Waiting for pending analysis task to complete...")
+        log.info("Cleaning up WebSocket connection...")
+        # Stop the analyzer, letting an in-flight analysis finish (with a timeout)
+        if analyzer_task:
+            analysis_stopping = True
+            analysis_wakeup.set()
             try:
-                await asyncio.wait_for(analysis_task, timeout=5.0)
+                await asyncio.wait_for(analyzer_task, timeout=5.0)
             except asyncio.TimeoutError:
-                logger.warning("Timeout waiting for analysis task to complete.")
-                analysis_task.cancel()
+                log.warning("Timeout waiting for analysis task to complete.")
             except Exception as task_err:
-                 logger.error(f"Error during final analysis task wait: {task_err}")
+                 log.error(f"Error during final analysis task wait: {task_err}")
+
+        # Stop the audio forwarder and outbound writer before tearing down Deepgram
+        if forward_task:
+            # Let the forwarder send any partially filled packet before Deepgram closes
+            try:
+                enqueue_message(audio_queue, None)
+                await asyncio.wait_for(forward_task, timeout=2.0)
+            except Exception as flush_err:
+                log.warning(f"Could not flush remaining audio to Deepgram: {flush_err}")
+                forward_task.cancel()
+        if audio_dropped:
+            log.warning("Dropped %d audio chunks during this session.", audio_dropped)
+        if writer_task:
+            # Send what is still queued, including any final analysis result
+            try:
+                enqueue_update(out_queue, None)
+                await asyncio.wait_for(writer_task, timeout=2.0)
+            except Exception as send_err:
+                log.warning(f"Could not send remaining messages to client: {send_err}")
+                writer_task.cancel()
 
         # Cleanly close the Deepgram connection if it was opened
         if dg_connection:
-            logger.info("Closing Deepgram connection...")
+            log.info("Closing Deepgram connection...")
             await dg_connection.finish()
-            logger.info("Deepgram connection closed.")
+            log.info("Deepgram connection closed.")
 
         # Ensure the WebSocket is closed from the server side
         try:
             # Check state before closing
             if websocket.client_state != WebSocketState.DISCONNECTED:
                  await websocket.close()
-                 logger.info("WebSocket connection closed from server.")
+                 log.info("WebSocket connection closed from server.")
         except RuntimeError as e:
              # Handle cases where the connection might already be closed unexpectedly
              if "WebSocket is not connected" in str(e):
-                  logger.warning("WebSocket already closed when attempting final close.")
+                  log.warning("WebSocket already closed when attempting final close.")
              else:
-                  logger.error(f"Runtime error during WebSocket close: {e}")
+                  log.error(f"Runtime error during WebSocket close: {e}")
         except Exception as e:
-             logger.error(f"Error during WebSocket close: {e}", exc_info=True)
+             log.error(f"Error during WebSocket close: {e}", exc_info=True)
 
 # --- Import necessary type for state checking ---
 from starlette.websockets import WebSocketState
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.endpoints import transcription, analysis, reports, documents, auth, realtime, deepgram_test
+from app.api.endpoints import transcription, analysis, reports, documents, auth, realtime, deepgram
 
 api_router = APIRouter()
 
@@ -10,4 +10,4 @@ api_router.include_router(analysis.router, prefix="/analysis", tags=["Analysis"]
 api_router.include_router(reports.router, prefix="/reports", tags=["Reports"])
 api_router.include_router(documents.router, prefix="/documents", tags=["Documents"])
 api_router.include_router(realtime.router, tags=["Realtime"])
-api_router.include_router(deepgram_test.router, prefix="/deepgram", tags=["Deepgram Test"]) 
\ No newline at end of file
+api_router.include_router(deepgram.router, prefix="/deepgram", tags=["Deepgram"]) 
\ No newline at end of file
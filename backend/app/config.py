@@ -18,6 +18,7 @@ class Settings(BaseSettings):
     
     # Security
     SECRET_KEY: str = os.getenv("SECRET_KEY", "")
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     
     # MongoDB
     DATABASE_URL: str = os.getenv("DATABASE_URL", "")
@@ -26,11 +27,17 @@ class Settings(BaseSettings):
     # External services
     DEEPGRAM_API_KEY: str = os.getenv("DEEPGRAM_API_KEY", "")
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
-    
-    # CORS
-    CORS_ORIGINS: list = ["*"]
+    GOOGLE_SPEECH_TO_TEXT_KEY: str = os.getenv("GOOGLE_SPEECH_TO_TEXT_KEY", "")
+    GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
+    
+    # CORS: origins allowed to call the API with credentials (the hosted
+    # frontend and local development servers)
+    CORS_ORIGIN_REGEX: str = os.getenv(
+        "CORS_ORIGIN_REGEX",
+        r"^(https://medicap-455306\.(web\.app|firebaseapp\.com)|http://(localhost|127\.0\.0\.1)(:\d+)?)$",
+    )
 
-@lru_cache()
+@lru_cache(maxsize=1)
 def get_settings() -> Settings:
     """Get application settings as a singleton for efficient reuse."""
     settings = Settings()
@@ -0,0 +1,41 @@
+import os
+import threading
+import time
+
+# Crockford base32 alphabet used by ULIDs
+_ENCODING = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_RANDOM_BITS = 80
+_RANDOM_MASK = (1 << _RANDOM_BITS) - 1
+
+_lock = threading.Lock()
+_last_ms = -1
+_random = 0
+
+def new_ulid() -> str:
+    """
+    Generate a ULID: a 48-bit millisecond timestamp followed by 80 random bits,
+    encoded as 26 Crockford base32 characters.
+
+    The random part is drawn from the OS once per millisecond; further IDs in
+    the same millisecond increment it, so IDs are unique, lexicographically
+    sortable by creation time, and don't each cost a urandom call.
+
+    Returns:
+        The ULID string
+    """
+    global _last_ms, _random
+    now_ms = time.time_ns() // 1_000_000
+    with _lock:
+        if now_ms > _last_ms:
+            _last_ms = now_ms
+            _random = int.from_bytes(os.urandom(10), "big")
+        else:
+            # Same (or an earlier, after a clock step) millisecond: stay monotonic
+            _random = (_random + 1) & _RANDOM_MASK
+        value = (_last_ms << _RANDOM_BITS) | _random
+
+    chars = []
+    for _ in range(26):
+        chars.append(_ENCODING[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
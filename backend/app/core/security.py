@@ -1,8 +1,13 @@
+import asyncio
+import hashlib
 import logging
+import re
+import time
+from cachetools import TTLCache
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 import firebase_admin
-from firebase_admin import auth
+from firebase_admin import auth, _token_gen
 from firebase_admin.auth import UserRecord
 
 logger = logging.getLogger(__name__)
@@ -13,6 +18,118 @@ logger = logging.getLogger(__name__)
 # verification happens via Firebase.
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login") # Placeholder tokenUrl
 
+# Process-wide cache of verified tokens, keyed by a hash of the raw token so
+# the bearer credential itself is never kept in memory longer than needed.
+# Entries are (decoded_token, exp) tuples; the one-minute TTL bounds how long
+# a revoked token can keep working.
+_token_cache = TTLCache(maxsize=10000, ttl=60)
+
+# Set to False when this firebase-admin version doesn't expose the internals
+# the prefetch relies on; keys are then fetched on first verification instead.
+_prefetch_supported = True
+
+# Fallback refresh interval when the key endpoint sends no max-age
+_JWKS_DEFAULT_MAX_AGE = 3600
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+def _fetch_public_keys() -> int:
+    """
+    Fetch Google's public keys through the Firebase Admin SDK's own
+    cache-control aware HTTP session, so subsequent `verify_id_token` calls
+    are served from that cache instead of the network.
+
+    This reaches into private firebase-admin internals (the token verifier's
+    request object and the certificate URL), so it raises AttributeError if
+    a firebase-admin release moves them.
+
+    Returns:
+        The max-age (in seconds) advertised by the key endpoint.
+    """
+    request = auth._get_client(None)._token_verifier.request
+    response = request(url=_token_gen.ID_TOKEN_CERT_URI, method="GET")
+    if response.status != 200:
+        raise RuntimeError(f"Public key fetch failed with HTTP {response.status}")
+
+    match = _MAX_AGE_RE.search(response.headers.get("cache-control", ""))
+    return int(match.group(1)) if match else _JWKS_DEFAULT_MAX_AGE
+
+async def prefetch_public_keys() -> int | None:
+    """
+    Warm the Firebase public key cache without blocking the event loop.
+
+    Returns:
+        The advertised key max-age in seconds, or None if the fetch failed.
+    """
+    global _prefetch_supported
+    if not firebase_admin._apps:
+        logger.warning("Firebase Admin SDK not initialized. Skipping public key prefetch.")
+        return None
+    if not _prefetch_supported:
+        return None
+
+    try:
+        max_age = await asyncio.to_thread(_fetch_public_keys)
+        logger.info(f"Prefetched Firebase public keys (max-age {max_age}s).")
+        return max_age
+    except AttributeError as e:
+        _prefetch_supported = False
+        logger.warning(
+            f"Public key prefetch is not supported by this firebase-admin version ({e}); "
+            "keys will be fetched on the first token verification instead."
+        )
+        return None
+    except Exception as e:
+        logger.error(f"Failed to prefetch Firebase public keys: {e}")
+        return None
+
+async def refresh_public_keys_loop(max_age: int | None = None):
+    """
+    Background task that re-fetches the public keys shortly before they expire.
+
+    Args:
+        max_age: The max-age returned by the initial prefetch, if any.
+    """
+    while _prefetch_supported:
+        # Refresh five minutes ahead of expiry; retry failures after a minute
+        delay = max(1, max_age - 300) if max_age else 60
+        await asyncio.sleep(delay)
+        max_age = await prefetch_public_keys()
+
+def token_cache_key(token: str) -> bytes:
+    """Return the cache key (a 128-bit BLAKE2b digest) for a raw bearer token."""
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+async def _cached_verify(token: str) -> dict:
+    """
+    Verify a Firebase ID token, reusing a recent verification result if available.
+
+    Args:
+        token: The raw Firebase ID token.
+
+    Returns:
+        The decoded token payload (dict).
+
+    Raises:
+        Any of the firebase_admin.auth verification errors on a cache miss.
+    """
+    key = token_cache_key(token)
+    cached = _token_cache.get(key)
+    if cached is not None:
+        decoded_token, expires_at = cached
+        # Never hand out a cached payload for a token that has since expired
+        if expires_at > time.time():
+            return decoded_token
+        _token_cache.pop(key, None)
+
+    # Verify the ID token using the Firebase Admin SDK.
+    # This verifies the signature, expiration, and issuer.
+    # `check_revoked=True` ensures that the token hasn't been revoked (e.g., user signed out).
+    # The check is blocking (RSA verification plus a revocation lookup over HTTP),
+    # so it runs in a worker thread to keep the event loop free.
+    decoded_token = await asyncio.to_thread(auth.verify_id_token, token, check_revoked=True)
+    _token_cache[key] = (decoded_token, decoded_token["exp"])
+    return decoded_token
+
 async def verify_firebase_token(token: str = Depends(oauth2_scheme)) -> UserRecord:
     """
     FastAPI dependency that verifies a Firebase ID token provided in the
@@ -36,10 +153,9 @@ async def verify_firebase_token(token: str = Depends(oauth2_scheme)) -> UserReco
         )
 
     try:
-        # Verify the ID token using the Firebase Admin SDK.
-        # This verifies the signature, expiration, and issuer.
-        # `check_revoked=True` ensures that the token hasn't been revoked (e.g., user signed out).
-        decoded_token = auth.verify_id_token(token, check_revoked=True)
+        # Verify the token, skipping the signature/revocation checks when the
+        # same token was verified within the last minute.
+        decoded_token = await _cached_verify(token)
         
         # Optionally, you can fetch the full UserRecord for more details
         # user = auth.get_user(decoded_token['uid'])
@@ -0,0 +1,101 @@
+import asyncio
+import orjson
+from fastapi import WebSocket
+
+# Interim transcription updates are held back this long (seconds) so later
+# ones can replace them before anything is sent
+TRANSCRIPT_FLUSH_INTERVAL = 0.05
+
+# Streams that send transcription deltas also send the full transcript at
+# most this often (seconds), so a client that missed a delta can resync
+TRANSCRIPT_SNAPSHOT_INTERVAL = 30.0
+
+async def send_json_fast(websocket: WebSocket, data) -> None:
+    """
+    Send `data` as a JSON text frame, serialized with orjson.
+
+    Drop-in replacement for `websocket.send_json`, which encodes with the
+    stdlib json module. The frame stays a text frame so browser clients can
+    keep calling `JSON.parse(event.data)`.
+    """
+    await websocket.send_text(orjson.dumps(data).decode())
+
+def enqueue_message(queue: asyncio.Queue, message) -> bool:
+    """
+    Queue an item without waiting, dropping the oldest queued item if full.
+
+    Returns:
+        True if an older item was dropped to make room
+    """
+    try:
+        queue.put_nowait(message)
+        return False
+    except asyncio.QueueFull:
+        queue.get_nowait()
+        queue.put_nowait(message)
+        return True
+
+def _is_interim(message) -> bool:
+    return isinstance(message, dict) and message.get("is_final") is False
+
+def enqueue_update(queue: asyncio.Queue, message) -> bool:
+    """
+    Queue an outbound message without waiting. If the queue is full, the
+    oldest interim transcription update is dropped to make room, since a
+    later update replaces it anyway; the oldest message of any kind is
+    dropped only when no interim update is queued.
+
+    Returns:
+        True if a queued message was dropped to make room
+    """
+    try:
+        queue.put_nowait(message)
+        return False
+    except asyncio.QueueFull:
+        queued = [queue.get_nowait() for _ in range(queue.qsize())]
+        dropped = next((i for i, item in enumerate(queued) if _is_interim(item)), 0)
+        del queued[dropped]
+        for item in queued:
+            queue.put_nowait(item)
+        queue.put_nowait(message)
+        return True
+
+async def send_transcription_updates(websocket: WebSocket, updates: asyncio.Queue) -> None:
+    """
+    Send queued messages to the client, several per frame, until None is queued.
+
+    Transcription updates (messages with an "is_final" key) carry either the
+    whole transcript so far or, as deltas, the segment in progress. Either
+    way an interim one is out of date once a newer update is queued behind
+    it, so it is dropped. Final updates and any other messages are always sent,
+    in order. Batches use the {"type": "batch", "items": [...]} envelope the
+    browser client already unpacks. Queueing None sends whatever is pending
+    and returns.
+    """
+    while True:
+        pending = [await updates.get()]
+        if pending[0] is not None and pending[0].get("is_final") is False:
+            await asyncio.sleep(TRANSCRIPT_FLUSH_INTERVAL)
+        while not updates.empty():
+            pending.append(updates.get_nowait())
+
+        stop = pending[-1] is None
+        if stop:
+            pending.pop()
+
+        batch = []
+        superseded = False
+        for message in reversed(pending):
+            if "is_final" in message:
+                if superseded and not message["is_final"]:
+                    continue
+                superseded = True
+            batch.append(message)
+        batch.reverse()
+
+        if len(batch) == 1:
+            await send_json_fast(websocket, batch[0])
+        elif batch:
+            await send_json_fast(websocket, {"type": "batch", "items": batch})
+        if stop:
+            return
@@ -50,6 +50,6 @@ async def close_mongo_connection():
 
 def get_database() -> Database:
     """Get database instance."""
-    if not db.db:
+    if db.db is None:
         raise Exception("Database not connected. Call connect_to_mongo() first.")
     return db.db 
\ No newline at end of file
@@ -1,4 +1,10 @@
+import asyncio
+import atexit
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack, asynccontextmanager
 # Import SSL fix module early to ensure SSL verification is properly configured
 from app.ssl_fix import apply_ssl_fixes
 
@@ -6,40 +12,133 @@ from app.ssl_fix import apply_ssl_fixes
 apply_ssl_fixes()
 
 # --- Firebase Admin SDK ---
-from firebase_admin import credentials, initialize_app
+import firebase_admin
+from firebase_admin import get_app, initialize_app
 import os
 # --- End Firebase Admin SDK ---
 
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import api_router # Updated import path
 # Remove or comment out the old WebSocket router import if no longer needed
 # from app.api.endpoints.realtime import websocket_router 
 # Import the new transcription router
 from app.api.endpoints.transcription import router as transcription_ws_router
+from app.api.endpoints import transcription
 from app.config import get_settings
+from app.core import security
+from app.db.database import close_mongo_connection, connect_to_mongo
+from app.services import ai_analysis, deepgram_service
 import uvicorn
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
+# Configure logging. Records are handed to a queue and written to stderr by
+# a listener thread, so the event loop never blocks on log output. `force`
+# replaces handlers that imported modules may already have installed.
+_log_queue = queue.SimpleQueue()
+_log_stream_handler = logging.StreamHandler()
+_log_stream_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+log_listener = QueueListener(_log_queue, _log_stream_handler)
+_log_queue_handler = QueueHandler(_log_queue)
+# The queue handler only merges args (and any traceback) into the message;
+# the stream handler applies the real format
+_log_queue_handler.setFormatter(logging.Formatter("%(message)s"))
+logging.basicConfig(level=logging.INFO, handlers=[_log_queue_handler], force=True)
+log_listener.start()
+# Flush anything still queued when the process exits
+atexit.register(log_listener.stop)
 logger = logging.getLogger(__name__)
 
 # --- Firebase Initialization ---
-# In Cloud Run, it automatically uses the service account credentials
-# No need to specify GOOGLE_APPLICATION_CREDENTIALS unless using a custom SA
-try:
-    firebase_app = initialize_app()
-    logger.info("Firebase Admin SDK initialized successfully using default environment credentials.")
-except Exception as e:
-    logger.error(f"Error initializing Firebase Admin SDK with default credentials: {e}", exc_info=True)
-    firebase_app = None
+def _init_firebase():
+    """
+    Initialize the Firebase Admin SDK. Runs in a worker thread from the
+    lifespan, so loading credentials doesn't hold up the server starting to listen.
+
+    Returns:
+        The Firebase app, or None if initialization failed
+    """
+    # In Cloud Run, it automatically uses the service account credentials
+    # No need to specify GOOGLE_APPLICATION_CREDENTIALS unless using a custom SA
+    try:
+        # The default app survives a lifespan restart within the same process
+        if firebase_admin._apps:
+            return get_app()
+        firebase_app = initialize_app()
+        logger.info("Firebase Admin SDK initialized successfully using default environment credentials.")
+        return firebase_app
+    except Exception as e:
+        logger.error(f"Error initializing Firebase Admin SDK with default credentials: {e}", exc_info=True)
+        return None
 # --- End Firebase Initialization ---
 
+# Worker threads available to asyncio.to_thread
+THREADPOOL_MAX_WORKERS = int(os.getenv("THREADPOOL_MAX_WORKERS", "32"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Create shared clients and background tasks on startup and release them on
+    shutdown. Each resource registers its cleanup on an AsyncExitStack as soon
+    as it exists, so cleanup runs in reverse order even if a later startup
+    step fails.
+    """
+    logger.info("Application startup")
+
+    # Blocking SDK calls (Firebase token verification, file I/O) are offloaded
+    # with asyncio.to_thread; size that thread pool explicitly
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=THREADPOOL_MAX_WORKERS, thread_name_prefix="blocking-io")
+    )
+
+    async with AsyncExitStack() as stack:
+        # Firebase; token verification fails with a 500 until this has succeeded
+        firebase_app = await asyncio.to_thread(_init_firebase)
+        app.state.firebase_app = firebase_app
+        if firebase_app:
+            logger.info("Firebase connection established during startup.")
+            # Fetch token-signing keys now rather than on the first authenticated request,
+            # and keep them warm in the background
+            max_age = await security.prefetch_public_keys()
+            jwks_refresh_task = asyncio.create_task(security.refresh_public_keys_loop(max_age))
+            stack.callback(jwks_refresh_task.cancel)
+        else:
+            logger.warning("Firebase connection NOT established during startup.")
+
+        # MongoDB (skipped with a warning when DATABASE_URL isn't configured)
+        await connect_to_mongo()
+        stack.push_async_callback(close_mongo_connection)
+
+        # Create the Deepgram clients here rather than at import, so importing the
+        # app has no side effects, and start pre-opening live connections so the
+        # first requests don't pay for connection setup.
+        app.state.http = deepgram_service.get_http_client()
+        stack.push_async_callback(deepgram_service.close_http_client)
+
+        app.state.deepgram_pool = transcription.create_deepgram_pool()
+        app.state.deepgram = app.state.deepgram_pool.client if app.state.deepgram_pool else None
+        if app.state.deepgram_pool:
+            stack.push_async_callback(app.state.deepgram_pool.close)
+            app.state.deepgram_pool.warm_up()
+
+        # Open the Gemini connection used for real-time transcript analysis
+        ai_analysis.warm_up()
+        stack.push_async_callback(ai_analysis.close)
+
+        # Log all registered routes for debugging
+        routes = [
+            f"{getattr(route, 'path', route)} [{','.join(route.methods) if hasattr(route, 'methods') and route.methods else 'WS'}]"
+            for route in app.routes
+        ]
+        logger.info(f"Registered routes: {routes}")
+
+        yield
+
+        logger.info("Application shutdown")
+
 # Create FastAPI app
-app = FastAPI(title="Medical Consultation API")
+# orjson-backed responses serialize considerably faster than the stdlib json default
+app = FastAPI(title="Medical Consultation API", default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # Get settings
 settings = get_settings()
@@ -47,10 +146,11 @@ settings = get_settings()
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # Modify as needed for production
+    # Explicit lists avoid the wildcard handling Starlette does per request
+    allow_origin_regex=settings.CORS_ORIGIN_REGEX,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "OPTIONS"],
+    allow_headers=["authorization", "content-type"],
 )
 
 # Include API router with /api prefix
@@ -63,28 +163,6 @@ app.include_router(transcription_ws_router)
 # app.include_router(websocket_router)
 # app.include_router(websocket_router, prefix="/api")
 
-# Startup and shutdown events
-@app.on_event("startup")
-async def startup_event():
-    logger.info("Application startup")
-    
-    # Log Firebase initialization status
-    if firebase_app:
-        logger.info("Firebase connection established during startup.")
-    else:
-        logger.warning("Firebase connection NOT established during startup.")
-        
-    # Log all registered routes for debugging
-    routes = [
-        f"{route.path} [{','.join(route.methods) if hasattr(route, 'methods') and route.methods else 'WS'}]"
-        for route in app.routes
-    ]
-    logger.info(f"Registered routes: {routes}")
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    logger.info("Application shutdown")
-
 @app.get("/")
 def read_root():
     return {"message": "Medical Consultation API"}
@@ -95,5 +173,17 @@ if __name__ == "__main__":
         "app.main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
+        # Auto-reload only while developing; it runs a single worker process
+        reload=settings.DEBUG,
+        workers=1 if settings.DEBUG else int(os.getenv("WEB_CONCURRENCY", "1")),
+        # uvloop and httptools come with uvicorn[standard]; name them explicitly
+        # so a missing install fails loudly instead of silently using asyncio
+        loop="uvloop",
+        http="httptools",
+        # Audio frames from the browser are a few KB; reject anything over 1 MB
+        # and ping idle clients so dead connections are noticed within ~40 s
+        ws="websockets",
+        ws_max_size=1024 * 1024,
+        ws_ping_interval=20,
+        ws_ping_timeout=20,
     ) 
\ No newline at end of file
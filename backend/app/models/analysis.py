@@ -0,0 +1,24 @@
+from pydantic import BaseModel
+from typing import List
+
+# Structure of the real-time transcript analysis returned by Gemini
+# (see SYSTEM_INSTRUCTION in app/services/ai_analysis.py)
+
+class Symptom(BaseModel):
+    description: str
+    is_primary: bool
+
+class Severity(BaseModel):
+    level: str  # "Low", "Medium", "High", "Urgent"
+    rationale: str
+
+class Diagnosis(BaseModel):
+    name: str
+    confidence: str  # "High", "Medium", "Low"
+    rationale: str
+
+class AnalysisResult(BaseModel):
+    symptoms: List[Symptom]
+    suggestions: List[str]
+    severity: Severity
+    diagnoses: List[Diagnosis]
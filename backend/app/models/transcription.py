@@ -1,7 +1,12 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional, Dict, Any
-from datetime import datetime
-import uuid
+from datetime import datetime, timezone
+
+from app.core.ids import new_ulid
+
+def _utcnow() -> datetime:
+    """Timezone-aware current UTC time (no local timezone lookup)."""
+    return datetime.now(timezone.utc)
 
 class TranscriptionSegment(BaseModel):
     speaker: str
@@ -10,20 +15,21 @@ class TranscriptionSegment(BaseModel):
     end_time: float
 
 class Transcription(BaseModel):
-    id: str = Field(default_factory=lambda: f"trans_{uuid.uuid4().hex}")
+    id: str = Field(default_factory=lambda: f"trans_{new_ulid()}")
     status: str  # "processing", "completed", "failed"
     text: Optional[str] = None
     segments: Optional[List[TranscriptionSegment]] = None
     error: Optional[str] = None
-    created_at: datetime = Field(default_factory=datetime.now)
-    updated_at: datetime = Field(default_factory=datetime.now)
+    created_at: datetime = Field(default_factory=_utcnow)
+    updated_at: datetime = Field(default_factory=_utcnow)
     audio_file_path: Optional[str] = None
     doctor_id: Optional[str] = None
     patient_id: Optional[str] = None
     consultation_date: Optional[datetime] = None
     
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        extra="ignore",
+        json_schema_extra={
             "example": {
                 "id": "trans_123456789abcdef",
                 "status": "completed",
@@ -50,4 +56,5 @@ class Transcription(BaseModel):
                 "patient_id": "pat_123456",
                 "consultation_date": "2023-10-15T14:30:00Z"
             }
-        } 
\ No newline at end of file
+        },
+    )
@@ -1,8 +1,22 @@
+import asyncio
+import functools
+import hashlib
 import os
 import google.generativeai as genai
 import json
 import logging
+from typing import Annotated, Any, AsyncIterator, Dict, List, Literal, Optional
+from cachetools import TTLCache
+from pydantic import TypeAdapter, ValidationError, WrapValidator
 from dotenv import load_dotenv
+from google.ai import generativelanguage as glm
+from google.ai.generativelanguage_v1beta.services.generative_service.transports.grpc_asyncio import (
+    GenerativeServiceGrpcAsyncIOTransport,
+)
+
+from app.models.analysis import AnalysisResult, Symptom
+from app.services.batcher import AsyncBatcher
+from app.services.rate_limiter import AsyncRateLimiter
 
 # Load environment variables
 load_dotenv()
@@ -12,8 +26,8 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Configure the Gemini API client
+api_key = os.getenv("GOOGLE_API_KEY")
 try:
-    api_key = os.getenv("GOOGLE_API_KEY")
     if not api_key:
         logger.error("GOOGLE_API_KEY not found in environment variables.")
         # Handle the error appropriately, maybe raise an exception or set a default
@@ -28,6 +42,15 @@ except ValueError as e:
 # Define the model name we want to use
 MODEL_NAME = "gemini-2.5-pro-exp-03-25" # Using the experimental model as requested
 
+# Flash-tier model for the real-time per-chunk analysis loop: several times
+# faster than the pro model, and the JSON output needs far fewer than 2K tokens
+FAST_MODEL_NAME = os.getenv("GEMINI_FAST_MODEL", "gemini-2.0-flash")
+FAST_MAX_OUTPUT_TOKENS = 768
+
+# "fast" serves real-time analysis during a consultation; "quality" uses the
+# pro model for callers that can afford to wait
+AnalysisTier = Literal["fast", "quality"]
+
 # Safety settings for the generation - adjust as needed
 SAFETY_SETTINGS = [
     {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
@@ -45,125 +68,416 @@ GENERATION_CONFIG = {
   "response_mime_type": "application/json", # Request JSON output directly
 }
 
+# Persona, tasks and output format, set as the model's system instruction.
+# Every request then starts with the same prefix, which Gemini can cache
+# across requests, and the user turn only carries the transcript itself.
+SYSTEM_INSTRUCTION = """\
+You are a highly astute medical assistant analyzing medical consultation transcripts of a conversation between a doctor and a patient.
+
+Based **strictly** on the transcript snippet provided, perform the following tasks with detail and nuance:
+1.  **Identify and list key patient symptoms mentioned.** Be precise and include any qualifying details mentioned (e.g., "sharp chest pain on inhalation, started 2 days ago", "mild, intermittent dizziness, worse on standing"). Distinguish between primary symptoms and associated minor complaints. If no clear symptoms are mentioned in this snippet, return an empty list.
+2.  **Suggest 3-5 insightful follow-up questions** the doctor could ask to further explore the patient's condition based on the *current* context. Questions should aim to clarify ambiguity, rule out differential diagnoses, or quantify symptoms (e.g., "On a scale of 1-10, how severe is the headache?", "Does the dizziness occur every time you stand?", "Have you experienced similar symptoms before?"). If the snippet lacks sufficient context for meaningful questions, return an empty list.
+3.  **Assess the potential clinical severity** based *only* on the information in this snippet. Use one of the following categories: "Low", "Medium", "High", "Urgent". Consider the nature of the symptoms mentioned (e.g., chest pain vs. mild headache). If severity cannot be reasonably determined from the snippet, default to "Low". Provide a brief (1-sentence) rationale for the chosen severity level.
+4.  **List up to 3 potential differential diagnoses** that could explain the symptoms mentioned *in this snippet*, ordered by likelihood. For each diagnosis, provide a confidence level ("High", "Medium", "Low") reflecting the certainty based *only* on this snippet. Include a brief (1-sentence) rationale explaining why each diagnosis is considered. If there is insufficient information for diagnostic suggestions, return an empty list.
+
+Return your analysis **strictly** in the following JSON format, with no explanatory text outside the JSON structure. Ensure all rationales are included within the specified fields:
+{
+  "symptoms": [
+    {"description": "Detailed symptom 1 description", "is_primary": true/false},
+    {"description": "Detailed symptom 2 description", "is_primary": true/false},
+    ...
+  ],
+  "suggestions": [
+    "Insightful question 1?",
+    "Insightful question 2?",
+    ...
+  ],
+  "severity": { "level": "Chosen Severity Level", "rationale": "Brief rationale for severity." },
+  "diagnoses": [
+    { "name": "Possible Diagnosis 1", "confidence": "High/Medium/Low", "rationale": "Brief rationale for this diagnosis based on snippet." },
+    { "name": "Possible Diagnosis 2", "confidence": "High/Medium/Low", "rationale": "Brief rationale for this diagnosis based on snippet." },
+    ...
+  ]
+}
+
+A message may contain several snippets, each introduced by a "=== SNIPPET i ===" line. The snippets come from unrelated consultations: analyze each one independently, never carrying information from one snippet into another, and return a JSON array with one analysis object per snippet, in the order given.
+"""
+
+# Build one model per tier once and reuse them for every analysis request.
+# They use the globally configured API key; if genai.configure() failed above,
+# requests will fail at call time and be logged there.
+_GENERATION_CONFIGS: Dict[str, dict] = {
+    "quality": GENERATION_CONFIG,
+    "fast": {**GENERATION_CONFIG, "max_output_tokens": FAST_MAX_OUTPUT_TOKENS},
+}
+_MODEL_NAMES: Dict[str, str] = {"quality": MODEL_NAME, "fast": FAST_MODEL_NAME}
+_MODELS: Dict[str, genai.GenerativeModel] = {}
+for _tier, _model_name in _MODEL_NAMES.items():
+    try:
+        _MODELS[_tier] = genai.GenerativeModel(
+            model_name=_model_name,
+            generation_config=_GENERATION_CONFIGS[_tier],
+            safety_settings=SAFETY_SETTINGS,
+            system_instruction=SYSTEM_INSTRUCTION,
+        )
+    except Exception as e:
+        logger.error(f"Failed to initialize Gemini model {_model_name}: {e}", exc_info=True)
+
+# Keepalive pings for the Gemini gRPC channel, so the single HTTP/2 connection
+# shared by all analyses survives idle gaps between consultations instead of
+# being silently dropped and re-established (TLS handshake included)
+_GRPC_CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+]
+
+def _create_channel(*args, options=(), **kwargs):
+    """Create the transport's gRPC channel with keepalive options added to the defaults."""
+    return GenerativeServiceGrpcAsyncIOTransport.create_channel(
+        *args, options=[*options, *_GRPC_CHANNEL_OPTIONS], **kwargs
+    )
+
+# Async client shared by the analysis models, created by `warm_up`
+_async_client: glm.GenerativeServiceAsyncClient | None = None
+
+def warm_up():
+    """
+    Give the analysis models one shared async gRPC client and start connecting.
+
+    gRPC multiplexes every concurrent analysis over one HTTP/2 connection, so
+    this opens it ahead of the first request. Must be called from the running
+    event loop (the application lifespan), since the channel binds to it.
+    """
+    global _async_client
+    if not _MODELS or not api_key:
+        return
+    try:
+        _async_client = glm.GenerativeServiceAsyncClient(
+            transport=functools.partial(GenerativeServiceGrpcAsyncIOTransport, channel=_create_channel),
+            client_options={"api_key": api_key},
+        )
+        for model in _MODELS.values():
+            model._async_client = _async_client
+        _async_client.transport.grpc_channel.get_state(try_to_connect=True)
+        logger.info("Gemini gRPC channel created for transcript analysis.")
+    except Exception as e:
+        # The models fall back to the SDK's default client on first use
+        logger.error(f"Failed to create Gemini async client: {e}")
+
+async def close():
+    """Close the gRPC channel created by `warm_up`, if any."""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.transport.close()
+        _async_client = None
+        for model in _MODELS.values():
+            model._async_client = None
+
+
+# Micro-batching: analysis requests arriving close together (e.g. from several
+# consultations) are sent to Gemini as one prompt instead of one call each
+GEMINI_BATCH_SIZE = int(os.getenv("GEMINI_BATCH_SIZE", "8"))
+GEMINI_BATCH_WAIT_MS = float(os.getenv("GEMINI_BATCH_WAIT_MS", "50"))
+
+# Client-side limits on Gemini calls, so bursts from many consultations queue
+# here instead of hitting the API's rate limit and backing off: at most
+# GEMINI_MAX_CONCURRENCY calls in flight, started at no more than GEMINI_QPM per minute
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "20"))
+GEMINI_QPM = int(os.getenv("GEMINI_QPM", "60"))
+_gemini_semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+_gemini_limiter = AsyncRateLimiter(GEMINI_QPM, 60)
+
+# Recent analyses keyed by a hash of the exact transcript text, so a repeated
+# snippet is answered without another Gemini call. Only successful analyses are cached.
+ANALYSIS_CACHE_TTL = int(os.getenv("ANALYSIS_CACHE_TTL", "600"))
+_analysis_cache = TTLCache(maxsize=1024, ttl=ANALYSIS_CACHE_TTL)
+
+def _build_prompt(transcript_text: str) -> str:
+    """Build the user turn for analyzing a single transcript snippet."""
+    return f"Transcript Snippet:\n---\n{transcript_text}\n---"
+
+def _build_batch_prompt(transcripts: List[str]) -> str:
+    """Build one user turn asking for a separate analysis of each snippet."""
+    snippets = "\n".join(
+        f"=== SNIPPET {i} ===\n{text}\n" for i, text in enumerate(transcripts, start=1)
+    )
+    return f"{len(transcripts)} transcript snippets, return exactly {len(transcripts)} analyses:\n\n{snippets}"
+
+def _none_if_invalid(value: Any, handler) -> AnalysisResult | None:
+    """Wrap validator that turns one invalid analysis in a batch into None instead of failing the batch."""
+    try:
+        return handler(value)
+    except ValidationError as e:
+        logger.error("Received unexpected or incomplete JSON structure from Gemini: %s", e)
+        return None
+
+# Validators built once at import; each response is decoded and validated in
+# a single pydantic-core call
+_RESULT_ADAPTER = TypeAdapter(AnalysisResult)
+_BATCH_RESULT_ADAPTER = TypeAdapter(List[Annotated[Optional[AnalysisResult], WrapValidator(_none_if_invalid)]])
+
+def _parse_analysis(response_text: str) -> dict | None:
+    """Parse and validate a single analysis straight from the Gemini response text."""
+    try:
+        return _RESULT_ADAPTER.validate_json(response_text).model_dump()
+    except ValidationError as e:
+        logger.error("Received invalid or incomplete analysis JSON from Gemini: %s", e)
+        logger.debug("Problematic response text: %r", response_text)
+        return None
+
+def _log_analysis(analysis_result: dict, source: str):
+    """
+    Log a one-line summary of a successful analysis. The full payload is only
+    formatted when DEBUG logging is enabled.
+    """
+    logger.info(
+        "Gemini analysis ok (%s): symptoms=%d diagnoses=%d severity=%s",
+        source,
+        len(analysis_result["symptoms"]),
+        len(analysis_result["diagnoses"]),
+        analysis_result["severity"]["level"],
+    )
+    logger.debug("Gemini analysis payload: %r", analysis_result)
+
+async def _analyze_batch(tier: AnalysisTier, transcripts: List[str]) -> List[dict | None]:
+    """
+    Analyze a batch of transcript snippets with a single Gemini call.
+
+    Args:
+        tier: Which model to use
+        transcripts: The snippets to analyze
+
+    Returns:
+        One analysis dict (or None if that snippet's analysis was invalid) per snippet, in order
+
+    Raises:
+        Any Gemini API or JSON decoding error; the batcher passes it on to every caller in the batch.
+    """
+    if len(transcripts) == 1:
+        prompt = _build_prompt(transcripts[0])
+        generation_config = None
+    else:
+        prompt = _build_batch_prompt(transcripts)
+        # Leave room for one full-size analysis per snippet
+        generation_config = {"max_output_tokens": _GENERATION_CONFIGS[tier]["max_output_tokens"] * len(transcripts)}
+
+    logger.info("Sending request to Gemini model %s (%d snippet(s))...", _MODEL_NAMES[tier], len(transcripts))
+    try:
+        async with _gemini_limiter, _gemini_semaphore:
+            response = await _MODELS[tier].generate_content_async(prompt, generation_config=generation_config) # Use async version
+    except Exception:
+        logger.error("Gemini API call failed for a batch of %d snippet(s).", len(transcripts))
+        raise
+
+    try:
+        # The response.text should already be JSON because we requested "application/json"
+        response_text = response.text
+    except Exception:
+        # response.text raises when the response was blocked; log why
+        if hasattr(response, 'prompt_feedback'):
+            logger.error("Prompt Feedback: %s", response.prompt_feedback)
+        if hasattr(response, 'candidates') and response.candidates:
+            logger.error("Finish Reason: %s", response.candidates[0].finish_reason)
+            logger.error("Safety Ratings: %s", response.candidates[0].safety_ratings)
+        raise
+
+    if len(transcripts) == 1:
+        # Decode and validate in a single pass
+        return [_parse_analysis(response_text)]
+
+    try:
+        # Invalid elements come back as None; anything other than a JSON array raises
+        results = _BATCH_RESULT_ADAPTER.validate_json(response_text)
+    except ValidationError as e:
+        logger.error("Expected a JSON array of %d analyses from Gemini: %s", len(transcripts), e)
+        logger.debug("Problematic response text: %r", response_text)
+        raise
+
+    return [result.model_dump() if result is not None else None for result in results]
+
+# One batcher per tier, since a batch goes to a single model
+_batchers: Dict[str, AsyncBatcher] = {
+    tier: AsyncBatcher(functools.partial(_analyze_batch, tier), max_batch=GEMINI_BATCH_SIZE, max_wait_ms=GEMINI_BATCH_WAIT_MS)
+    for tier in _MODEL_NAMES
+}
+
+def _cache_key(tier: AnalysisTier, transcript_text: str) -> bytes:
+    """Cache key for an analysis: the tier plus a 128-bit BLAKE2b digest of the text."""
+    return tier.encode() + hashlib.blake2b(transcript_text.encode(), digest_size=16).digest()
+
 # Function to analyze transcript chunk using Gemini
-async def analyze_transcript_chunk(transcript_text: str) -> dict | None:
+async def analyze_transcript_chunk(transcript_text: str, tier: AnalysisTier = "fast") -> dict | None:
     """
     Analyzes a chunk of transcript text using the Gemini API to extract symptoms,
     suggest questions, assess severity, and provide possible diagnoses.
+    Concurrent calls are batched into a single Gemini request.
 
     Args:
         transcript_text: The text of the conversation transcript chunk.
+        tier: "fast" (flash model, for real-time analysis) or "quality" (pro model).
 
     Returns:
         A dictionary containing 'symptoms', 'suggestions', 'severity', and 'diagnoses' if successful,
         otherwise None.
     """
+    if tier not in _MODELS:
+        logger.error(f"Gemini {tier} model not initialized. Skipping transcript analysis.")
+        return None
+
+    key = _cache_key(tier, transcript_text)
+    cached = _analysis_cache.get(key)
+    if cached is not None:
+        logger.info("Returning cached analysis for identical transcript text.")
+        return cached
+
     try:
-        # Instantiating the model here will use the globally configured API key
-        # If genai.configure() failed earlier, this instantiation will likely raise an error
-        model = genai.GenerativeModel(
-            model_name=MODEL_NAME,
-            generation_config=GENERATION_CONFIG,
-            safety_settings=SAFETY_SETTINGS
-        )
+        analysis_result = await _batchers[tier].submit(transcript_text)
+    except Exception as e:
+        # Catch other potential errors (API connection issues, malformed batch responses, etc.)
+        logger.error(f"An error occurred during Gemini API call: {e}", exc_info=True)
+        return None
+
+    if analysis_result is not None:
+        _analysis_cache[key] = analysis_result
+        _log_analysis(analysis_result, "batched")
+    return analysis_result
+
+async def analyze_transcript_chunks(chunks: List[str], tier: AnalysisTier = "fast") -> List[dict | None | BaseException]:
+    """
+    Analyze several transcript chunks concurrently instead of one after another.
+    Gemini calls are still bounded by the module's concurrency and rate limits.
+
+    Args:
+        chunks: The transcript chunks to analyze
+        tier: Which model to use (see `analyze_transcript_chunk`)
+
+    Returns:
+        One entry per chunk, in order: the analysis dict, None if that analysis
+        failed, or the exception raised while analyzing it.
+    """
+    return await asyncio.gather(*(analyze_transcript_chunk(chunk, tier) for chunk in chunks), return_exceptions=True)
+
+class _SymptomScanner:
+    """
+    Incrementally picks complete objects out of the "symptoms" array of a
+    partially received analysis, so each symptom can be used as soon as its
+    closing brace arrives. Relies on "symptoms" being the first key, as the
+    prompt's output format specifies.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0 # Next character to scan
+        self.in_array = False
+        self.done = False
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.object_start = 0
 
-        # Construct the prompt for the LLM
-        # Instructing it to act as a medical assistant and return JSON
-        prompt = f"""
-        Analyze the following medical consultation transcript snippet. Act as a highly astute medical assistant analyzing the conversation between a doctor and a patient.
-
-        Transcript Snippet:
-        ---
-        {transcript_text}
-        ---
-
-        Based **strictly** on the transcript snippet provided, perform the following tasks with detail and nuance:
-        1.  **Identify and list key patient symptoms mentioned.** Be precise and include any qualifying details mentioned (e.g., "sharp chest pain on inhalation, started 2 days ago", "mild, intermittent dizziness, worse on standing"). Distinguish between primary symptoms and associated minor complaints. If no clear symptoms are mentioned in this snippet, return an empty list.
-        2.  **Suggest 3-5 insightful follow-up questions** the doctor could ask to further explore the patient's condition based on the *current* context. Questions should aim to clarify ambiguity, rule out differential diagnoses, or quantify symptoms (e.g., "On a scale of 1-10, how severe is the headache?", "Does the dizziness occur every time you stand?", "Have you experienced similar symptoms before?"). If the snippet lacks sufficient context for meaningful questions, return an empty list.
-        3.  **Assess the potential clinical severity** based *only* on the information in this snippet. Use one of the following categories: "Low", "Medium", "High", "Urgent". Consider the nature of the symptoms mentioned (e.g., chest pain vs. mild headache). If severity cannot be reasonably determined from the snippet, default to "Low". Provide a brief (1-sentence) rationale for the chosen severity level.
-        4.  **List up to 3 potential differential diagnoses** that could explain the symptoms mentioned *in this snippet*, ordered by likelihood. For each diagnosis, provide a confidence level ("High", "Medium", "Low") reflecting the certainty based *only* on this snippet. Include a brief (1-sentence) rationale explaining why each diagnosis is considered. If there is insufficient information for diagnostic suggestions, return an empty list.
-
-        Return your analysis **strictly** in the following JSON format, with no explanatory text outside the JSON structure. Ensure all rationales are included within the specified fields:
-        {{
-          "symptoms": [
-            {{"description": "Detailed symptom 1 description", "is_primary": true/false}},
-            {{"description": "Detailed symptom 2 description", "is_primary": true/false}},
-            ...
-          ],
-          "suggestions": [
-            "Insightful question 1?",
-            "Insightful question 2?",
-            ...
-          ],
-          "severity": {{ "level": "Chosen Severity Level", "rationale": "Brief rationale for severity." }},
-          "diagnoses": [
-            {{ "name": "Possible Diagnosis 1", "confidence": "High/Medium/Low", "rationale": "Brief rationale for this diagnosis based on snippet." }},
-            {{ "name": "Possible Diagnosis 2", "confidence": "High/Medium/Low", "rationale": "Brief rationale for this diagnosis based on snippet." }},
-            ...
-          ]
-        }}
+    def feed(self, text: str) -> List[dict]:
         """
+        Add streamed text and return the symptoms completed by it.
+
+        Args:
+            text: The next piece of the response text
 
-        logger.info(f"Sending request to Gemini model {MODEL_NAME}...")
-        response = await model.generate_content_async(prompt) # Use async version
+        Returns:
+            Validated symptom dicts, in order; empty if none were completed
+        """
+        self.buffer += text
+        found = []
+        if self.done:
+            return found
+        if not self.in_array:
+            key = self.buffer.find('"symptoms"')
+            bracket = self.buffer.find("[", key) if key >= 0 else -1
+            if bracket < 0:
+                return found
+            self.in_array = True
+            self.pos = bracket + 1
 
-        # Log the raw response text for debugging (optional)
-        # logger.debug(f"Raw Gemini Response Text: {response.text}")
+        buffer = self.buffer
+        while self.pos < len(buffer):
+            char = buffer[self.pos]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == "{":
+                if self.depth == 0:
+                    self.object_start = self.pos
+                self.depth += 1
+            elif char == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    try:
+                        found.append(Symptom.model_validate_json(buffer[self.object_start:self.pos + 1]).model_dump())
+                    except ValidationError as e:
+                        logger.warning(f"Skipping malformed streamed symptom: {e}")
+            elif char == "]" and self.depth == 0:
+                self.done = True
+                break
+            self.pos += 1
+        return found
 
-        # The response.text should already be JSON because we requested "application/json"
-        # We still parse it to ensure it's valid JSON and convert it to a Python dict
-        analysis_result = json.loads(response.text)
-
-        # Enhanced validation for the new structure
-        if not isinstance(analysis_result, dict) or \
-           not isinstance(analysis_result.get('symptoms'), list) or \
-           not isinstance(analysis_result.get('suggestions'), list) or \
-           not isinstance(analysis_result.get('severity'), dict) or \
-           not isinstance(analysis_result.get('diagnoses'), list) or \
-           'level' not in analysis_result.get('severity', {}) or \
-           'rationale' not in analysis_result.get('severity', {}):
-            # Further checks for list items can be added if needed
-            logger.error(f"Received unexpected or incomplete JSON structure from Gemini: {analysis_result}")
-            return None
-        
-        # Validate symptom structure (optional but good practice)
-        for symptom in analysis_result.get('symptoms', []):
-            if not isinstance(symptom, dict) or \
-               'description' not in symptom or \
-               'is_primary' not in symptom:
-                logger.error(f"Invalid symptom structure found: {symptom}")
-                return None
-        
-        # Validate diagnoses structure (optional but good practice)
-        for diagnosis in analysis_result.get('diagnoses', []):
-            if not isinstance(diagnosis, dict) or \
-               'name' not in diagnosis or \
-               'confidence' not in diagnosis or \
-               'rationale' not in diagnosis:
-                logger.error(f"Invalid diagnosis structure found: {diagnosis}")
-                return None
-        
-        logger.info(f"Successfully received analysis from Gemini: {analysis_result}")
-        return analysis_result
-
-    except json.JSONDecodeError as e:
-        logger.error(f"Failed to decode JSON response from Gemini: {e}")
-        logger.error(f"Problematic response text: {response.text if 'response' in locals() else 'No response object'}")
-        return None
+async def stream_transcript_analysis(transcript_text: str, tier: AnalysisTier = "fast") -> AsyncIterator[tuple[str, Any]]:
+    """
+    Analyze a chunk of transcript text like `analyze_transcript_chunk`, but stream
+    the Gemini response so symptoms are available before the whole analysis is.
+    Streamed requests are not batched.
+
+    Args:
+        transcript_text: The text of the conversation transcript chunk.
+        tier: Which model to use (see `analyze_transcript_chunk`)
+
+    Yields:
+        ("symptom", dict) for each symptom as soon as it has been received, then
+        ("analysis", dict | None) with the full validated analysis, or None on failure.
+    """
+    if tier not in _MODELS:
+        logger.error(f"Gemini {tier} model not initialized. Skipping transcript analysis.")
+        yield "analysis", None
+        return
+
+    key = _cache_key(tier, transcript_text)
+    cached = _analysis_cache.get(key)
+    if cached is not None:
+        logger.info("Returning cached analysis for identical transcript text.")
+        for symptom in cached["symptoms"]:
+            yield "symptom", symptom
+        yield "analysis", cached
+        return
+
+    scanner = _SymptomScanner()
+    try:
+        async with _gemini_limiter, _gemini_semaphore:
+            logger.info("Streaming request to Gemini model %s...", _MODEL_NAMES[tier])
+            response = await _MODELS[tier].generate_content_async(_build_prompt(transcript_text), stream=True)
+            async for chunk in response:
+                for symptom in scanner.feed(chunk.text):
+                    yield "symptom", symptom
     except Exception as e:
-        # Catch other potential errors (API connection issues, etc.)
-        logger.error(f"An error occurred during Gemini API call: {e}", exc_info=True)
-        # Log response details if available
-        if 'response' in locals() and hasattr(response, 'prompt_feedback'):
-             logger.error(f"Prompt Feedback: {response.prompt_feedback}")
-        if 'response' in locals() and hasattr(response, 'candidates') and response.candidates:
-             logger.error(f"Finish Reason: {response.candidates[0].finish_reason}")
-             logger.error(f"Safety Ratings: {response.candidates[0].safety_ratings}")
-        return None
+        # API connection issues, blocked responses, etc.
+        logger.error(f"An error occurred during streaming Gemini API call: {e}", exc_info=True)
+        yield "analysis", None
+        return
+
+    analysis_result = _parse_analysis(scanner.buffer)
+    if analysis_result is not None:
+        _analysis_cache[key] = analysis_result
+        _log_analysis(analysis_result, "streamed")
+    yield "analysis", analysis_result
 
 # Example usage (for testing purposes)
 if __name__ == "__main__":
-    import asyncio
 
     async def test_analysis():
         # Ensure API key is loaded if running directly
@@ -1,7 +1,4 @@
-import os
-from typing import Dict, Any, List, Optional
-import json
-import httpx
+from typing import Dict, Any, List, AsyncIterator
 # Comment out this import since we're using simulated responses for now
 # import google.generativeai as genai
 from app.core.config import settings
@@ -9,109 +6,107 @@ from app.core.config import settings
 # Configure the Gemini API with your API key (commented out for now)
 # genai.configure(api_key=settings.GEMINI_API_KEY)
 
+# Simulated responses for demonstration, built once at import. They are shared
+# between requests, so callers must treat them as read-only.
+_FAKE_ANALYSIS: Dict[str, Any] = {
+    "identified_symptoms": [
+        {
+            "symptom": "Headache",
+            "severity": "Moderate",
+            "duration": "3 days",
+            "confidence": 0.95
+        },
+        {
+            "symptom": "Light sensitivity",
+            "severity": "Mild",
+            "duration": "When headache occurs",
+            "confidence": 0.85
+        }
+    ],
+    "potential_conditions": [
+        {
+            "condition": "Migraine",
+            "confidence": 0.75,
+            "supporting_symptoms": ["Headache", "Light sensitivity"]
+        },
+        {
+            "condition": "Tension headache",
+            "confidence": 0.45,
+            "supporting_symptoms": ["Headache"]
+        }
+    ],
+    "summary": "Patient reports moderate headache lasting for 3 days with some sensitivity to light. No fever or other symptoms reported."
+}
+
+_FAKE_QUESTIONS: List[Dict[str, Any]] = [
+    {
+        "question": "Have you experienced any nausea or vomiting with the headaches?",
+        "relevance_score": 0.95,
+        "context": "Important to differentiate between migraine and other headache types"
+    },
+    {
+        "question": "Is the headache on one side of your head or both sides?",
+        "relevance_score": 0.9,
+        "context": "Unilateral pain is more indicative of migraine"
+    },
+    {
+        "question": "Have you taken any medication for the headache, and if so, did it help?",
+        "relevance_score": 0.85,
+        "context": "Response to specific medications can help with diagnosis"
+    }
+]
+
 async def analyze_transcript(transcript_text: str) -> Dict[str, Any]:
     """
     Analyze a medical transcript to identify symptoms, conditions, and other relevant information.
-    Uses Google Gemini API to perform the analysis.
+    Currently returns a simulated analysis; real-time Gemini analysis lives in
+    app.services.ai_analysis.
     
     Args:
         transcript_text: The text of the transcript to analyze
         
     Returns:
         Dictionary containing identified symptoms, potential conditions, and analysis summary
+        (shared, do not modify)
     """
-    try:
-        # In a real implementation:
-        # 1. Set up the model
-        # model = genai.GenerativeModel('gemini-1.5-pro')
-        # 2. Create a structured prompt for symptom identification
-        # 3. Call the API and parse the response
-        
-        # Simulated response for demonstration
-        return {
-            "identified_symptoms": [
-                {
-                    "symptom": "Headache",
-                    "severity": "Moderate",
-                    "duration": "3 days",
-                    "confidence": 0.95
-                },
-                {
-                    "symptom": "Light sensitivity",
-                    "severity": "Mild",
-                    "duration": "When headache occurs",
-                    "confidence": 0.85
-                }
-            ],
-            "potential_conditions": [
-                {
-                    "condition": "Migraine",
-                    "confidence": 0.75,
-                    "supporting_symptoms": ["Headache", "Light sensitivity"]
-                },
-                {
-                    "condition": "Tension headache",
-                    "confidence": 0.45,
-                    "supporting_symptoms": ["Headache"]
-                }
-            ],
-            "summary": "Patient reports moderate headache lasting for 3 days with some sensitivity to light. No fever or other symptoms reported."
-        }
-    
-    except Exception as e:
-        # In a real application, you'd want to log this error
-        print(f"Error analyzing transcript: {str(e)}")
-        return {
-            "identified_symptoms": [],
-            "potential_conditions": [],
-            "summary": f"Error analyzing transcript: {str(e)}"
-        }
+    return _FAKE_ANALYSIS
 
 async def generate_questions(transcript_text: str, identified_symptoms: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
     Generate follow-up questions based on the transcript and identified symptoms.
-    Uses Google Gemini API to generate contextually relevant questions.
+    Currently returns simulated questions.
     
     Args:
         transcript_text: The text of the transcript
         identified_symptoms: List of symptoms already identified
         
     Returns:
-        List of suggested follow-up questions
+        List of suggested follow-up questions (shared, do not modify)
     """
-    try:
-        # In a real implementation:
-        # 1. Set up the model
-        # model = genai.GenerativeModel('gemini-1.5-pro')
-        # 2. Create structured prompt with symptoms
-        # 3. Call the API and parse the response
+    return _FAKE_QUESTIONS
+
+async def stream_analysis(transcript_text: str) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Analyze a transcript incrementally, yielding results as soon as they are available
+    instead of waiting for every analysis step to finish.
+    
+    Args:
+        transcript_text: The text of the transcript to analyze
         
-        # Simulated response for demonstration
-        return [
-            {
-                "question": "Have you experienced any nausea or vomiting with the headaches?",
-                "relevance_score": 0.95,
-                "context": "Important to differentiate between migraine and other headache types"
-            },
-            {
-                "question": "Is the headache on one side of your head or both sides?",
-                "relevance_score": 0.9,
-                "context": "Unilateral pain is more indicative of migraine"
-            },
-            {
-                "question": "Have you taken any medication for the headache, and if so, did it help?",
-                "relevance_score": 0.85,
-                "context": "Response to specific medications can help with diagnosis"
-            }
-        ]
+    Yields:
+        Event dictionaries of the form {"type": ..., "data": ...}: one "symptom" event per
+        identified symptom, then one "question" event per suggested question, and finally
+        a "summary" event
+    """
+    analysis_result = await analyze_transcript(transcript_text)
+    identified_symptoms = analysis_result.get("identified_symptoms", [])
+    
+    # Symptoms go out before question generation starts
+    for symptom in identified_symptoms:
+        yield {"type": "symptom", "data": symptom}
+    
+    questions = await generate_questions(transcript_text, identified_symptoms)
+    for question in questions:
+        yield {"type": "question", "data": question}
     
-    except Exception as e:
-        # In a real application, you'd want to log this error
-        print(f"Error generating questions: {str(e)}")
-        return [
-            {
-                "question": "Can you describe your symptoms in more detail?",
-                "relevance_score": 0.7,
-                "context": "General follow-up question"
-            }
-        ] 
\ No newline at end of file
+    yield {"type": "summary", "data": analysis_result.get("summary")}
@@ -0,0 +1,124 @@
+# backend/app/services/batcher.py
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Approximate token-length bucket limits. Requests are only batched with
+# others of a similar size so one long transcript doesn't pad a whole batch.
+DEFAULT_TOKEN_BUCKETS = (1000, 4000, 16000)
+
+def approximate_tokens(text: str) -> int:
+    """Rough token count for a piece of text (~4 characters per token)."""
+    return len(text) // 4
+
+class AsyncBatcher:
+    """
+    Collects individual requests into small batches and processes each batch
+    with a single call to `handler`.
+
+    A batch is dispatched as soon as `max_batch` requests are queued, or
+    `max_wait_ms` after its first request arrived, whichever comes first.
+    Each caller gets back the result at its own position in the batch.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[List[Any]], Awaitable[Sequence[Any]]],
+        max_batch: int = 8,
+        max_wait_ms: float = 50,
+        buckets: Sequence[int] = DEFAULT_TOKEN_BUCKETS,
+        size_of: Callable[[Any], int] = approximate_tokens,
+    ):
+        """
+        Args:
+            handler: Coroutine that takes a list of items and returns one result per item
+            max_batch: Maximum number of items sent to `handler` at once
+            max_wait_ms: Maximum time the first item in a batch waits for others
+            buckets: Ascending size limits used to group items of similar size
+            size_of: Function returning the size of an item (compared against `buckets`)
+        """
+        self.handler = handler
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.buckets = tuple(buckets)
+        self.size_of = size_of
+        self._queues: Dict[int, asyncio.Queue] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+
+    def _bucket_for(self, item: Any) -> int:
+        size = self.size_of(item)
+        for index, limit in enumerate(self.buckets):
+            if size <= limit:
+                return index
+        return len(self.buckets)
+
+    def _queue_for(self, bucket: int) -> asyncio.Queue:
+        worker = self._workers.get(bucket)
+        if worker is None or worker.done():
+            # Start (or restart) the worker for this bucket on the running loop
+            self._queues[bucket] = asyncio.Queue()
+            self._workers[bucket] = asyncio.create_task(self._run(self._queues[bucket]))
+        return self._queues[bucket]
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Queue an item for batched processing and wait for its result.
+
+        Args:
+            item: The item to process
+
+        Returns:
+            The result produced by `handler` for this item
+
+        Raises:
+            Any exception raised by `handler` for the batch containing this item.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue_for(self._bucket_for(item)).put((item, future))
+        return await future
+
+    async def _collect(self, queue: asyncio.Queue) -> List[Tuple[Any, asyncio.Future]]:
+        """Wait for the first item, then gather more until the batch is full or the wait expires."""
+        loop = asyncio.get_running_loop()
+        batch = [await queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self, queue: asyncio.Queue):
+        while True:
+            batch = await self._collect(queue)
+            items = [item for item, _ in batch]
+            try:
+                results = await self.handler(items)
+                if len(results) != len(items):
+                    raise ValueError(f"Batch handler returned {len(results)} results for {len(items)} items")
+            except Exception as e:
+                logger.error(f"Batch of {len(items)} items failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                # The caller may have been cancelled while the batch was in flight
+                if not future.done():
+                    future.set_result(result)
+
+    async def close(self):
+        """Stop all background workers."""
+        for worker in self._workers.values():
+            worker.cancel()
+        await asyncio.gather(*self._workers.values(), return_exceptions=True)
+        self._workers.clear()
+        self._queues.clear()
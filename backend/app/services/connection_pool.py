@@ -0,0 +1,104 @@
+# backend/app/services/connection_pool.py
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Set
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class ConnectionPool:
+    """
+    Keeps a few upstream streaming connections open ahead of time, so a new
+    client doesn't wait on the TLS and WebSocket handshake.
+
+    A connection carries the state of one streaming session, so connections
+    are never returned to the pool: `acquire` hands out an idle connection
+    and opens a replacement in the background. Idle connections must be kept
+    alive by the connection itself (keepalive messages or pings); one that
+    was dropped anyway is discarded rather than handed out.
+    """
+
+    def __init__(
+        self,
+        open: Callable[[], Awaitable[Any]],
+        is_alive: Callable[[Any], Awaitable[bool]],
+        close: Callable[[Any], Awaitable[Any]],
+        size: int = 2,
+        name: str = "upstream",
+    ):
+        """
+        Args:
+            open: Coroutine function that opens and returns a new connection
+            is_alive: Coroutine function that checks whether a connection is still open
+            close: Coroutine function that closes a connection
+            size: Number of idle connections to keep open
+            name: Name of the upstream service, used in log messages
+        """
+        self._open = open
+        self._is_alive = is_alive
+        self._close = close
+        self.size = size
+        self.name = name
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._pending: Set[asyncio.Task] = set()
+        self._closing: Set[asyncio.Task] = set()
+
+    def _refill(self):
+        task = asyncio.create_task(self._open_idle())
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _open_idle(self):
+        try:
+            connection = await self._open()
+        except Exception as e:
+            logger.error(f"Failed to pre-open {self.name} connection: {e}")
+            return
+        if self._idle.qsize() < self.size:
+            self._idle.put_nowait(connection)
+        else:
+            await self._close(connection)
+
+    async def _discard(self, connection):
+        try:
+            await self._close(connection)
+        except Exception as e:
+            logger.error(f"Error closing pooled {self.name} connection: {e}")
+
+    def warm_up(self):
+        """Open connections in the background until `size` are idle. Safe to call repeatedly."""
+        for _ in range(self.size - self._idle.qsize() - len(self._pending)):
+            self._refill()
+
+    async def acquire(self):
+        """
+        Get an open connection, preferring an idle pre-opened one.
+
+        Returns:
+            An open connection, owned (and closed) by the caller
+
+        Raises:
+            Whatever `open` raises if no pooled connection is usable and a new one can't be opened
+        """
+        while not self._idle.empty():
+            connection = self._idle.get_nowait()
+            self._refill()
+            if await self._is_alive(connection):
+                return connection
+            # Dropped while idle (e.g. network hiccup); discard it
+            logger.warning(f"Discarding disconnected pooled {self.name} connection.")
+            task = asyncio.create_task(self._discard(connection))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+
+        # Nothing ready: connect directly and top the pool back up
+        self.warm_up()
+        return await self._open()
+
+    async def close(self):
+        """Cancel pending opens and close all idle connections."""
+        for task in list(self._pending):
+            task.cancel()
+        await asyncio.gather(*self._pending, *self._closing, return_exceptions=True)
+        while not self._idle.empty():
+            await self._discard(self._idle.get_nowait())
@@ -0,0 +1,34 @@
+# backend/app/services/deepgram_pool.py
+from deepgram import DeepgramClient, LiveOptions
+
+from app.services.connection_pool import ConnectionPool
+
+class DeepgramConnectionPool(ConnectionPool):
+    """
+    Pool of started Deepgram live connections. The client must be configured
+    with keepalive enabled, or Deepgram closes idle connections after a few
+    seconds.
+    """
+
+    def __init__(self, client: DeepgramClient, options: LiveOptions, size: int = 2):
+        """
+        Args:
+            client: The Deepgram client used to open connections
+            options: Live transcription options every pooled connection is started with
+            size: Number of idle connections to keep open
+        """
+        self.client = client
+        self.options = options
+        super().__init__(
+            self._start_connection,
+            lambda connection: connection.is_connected(),
+            lambda connection: connection.finish(),
+            size=size,
+            name="Deepgram",
+        )
+
+    async def _start_connection(self):
+        connection = self.client.listen.asynclive.v("1")
+        if not await connection.start(self.options):
+            raise RuntimeError("Failed to start Deepgram live connection")
+        return connection
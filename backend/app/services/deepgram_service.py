@@ -2,15 +2,17 @@
 import logging
 import asyncio
 import os
-from typing import Dict, Any, Optional, List
-from fastapi import WebSocket, HTTPException, UploadFile
+from functools import lru_cache
+from typing import Callable, Dict, Any, Optional, List
+from fastapi import WebSocket, WebSocketDisconnect, HTTPException, UploadFile
+from starlette.websockets import WebSocketState
 import io
 import os
-import tempfile
+import re
 import ssl
 import certifi
-from dotenv import load_dotenv
-from app.config import get_settings
+import httpx
+import orjson
 
 # Add these imports for SSL handling
 import urllib3
@@ -22,15 +24,24 @@ from deepgram import (
     DeepgramClientOptions,
     LiveTranscriptionEvents,
     LiveOptions,
-    PrerecordedOptions,
-    FileSource
 )
 
 from app.core.config import settings
+from app.core.websocket import send_json_fast, send_transcription_updates
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# One TLS context for every HTTPS connection this module opens, so the CA
+# bundle is parsed once rather than for each new client or connection. In
+# development mode certificates are not verified.
+if settings.DEBUG:
+    _SSL_CONTEXT = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    _SSL_CONTEXT.check_hostname = False
+    _SSL_CONTEXT.verify_mode = ssl.CERT_NONE
+else:
+    _SSL_CONTEXT = ssl.create_default_context(cafile=certifi.where())
+
 # Disable SSL warnings in development mode
 if settings.DEBUG:
     # Disable SSL verification warnings
@@ -46,18 +57,48 @@ if settings.DEBUG:
     requests.packages.urllib3.disable_warnings()
     
     # Patch SSL context for all future SSL connections
-    # This is a more aggressive approach but should fix the issues in development
-    def create_unverified_ssl_context():
-        context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
-        context.check_hostname = False
-        context.verify_mode = ssl.CERT_NONE
-        return context
-    
-    # Apply the patch globally for Python's SSL module
-    ssl._create_default_https_context = create_unverified_ssl_context
+    # This is a more aggressive approach but should fix the issues in development.
+    # Each caller gets its own context: http.client and httpx both set ALPN
+    # protocols on the context they are given, so _SSL_CONTEXT is not shared.
+    ssl._create_default_https_context = ssl._create_unverified_context
     
     logger.warning("⚠️ DEVELOPMENT MODE: SSL verification completely disabled for all connections")
 
+# Cap on concurrent prerecorded transcription requests to Deepgram. Bursts
+# beyond this queue locally instead of piling up on the SDK's connection pool.
+DEEPGRAM_MAX_CONCURRENT_REQUESTS = int(os.getenv("DEEPGRAM_MAX_CONCURRENT_REQUESTS", "32"))
+_prerecorded_semaphore = asyncio.Semaphore(DEEPGRAM_MAX_CONCURRENT_REQUESTS)
+
+# Prerecorded transcription goes straight to the REST endpoint so uploads can
+# be streamed through in chunks; the SDK's transcribe_file needs the whole file
+DEEPGRAM_LISTEN_URL = "https://api.deepgram.com/v1/listen"
+UPLOAD_CHUNK_SIZE = 64 * 1024
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the shared HTTP client for Deepgram REST requests, creating it on first use."""
+    global _http_client
+    if _http_client is None:
+        # Reuse the module's TLS context (unverified in development mode)
+        _http_client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=32),
+            timeout=httpx.Timeout(300.0, connect=10.0),
+            verify=_SSL_CONTEXT,
+        )
+    return _http_client
+
+async def close_http_client():
+    """Close the shared Deepgram HTTP client, if it was created."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+# Keepalive has the SDK send KeepAlive messages on live connections, so Deepgram
+# doesn't close them during pauses in the audio
+DEEPGRAM_CLIENT_OPTIONS = DeepgramClientOptions(options={"keepalive": "true"})
+
 # Initialize the global DeepgramClient instance at module level
 deepgram_client = None
 try:
@@ -66,7 +107,7 @@ try:
     if api_key:
         logger.info("Initializing Deepgram client with API key")
         # Client initialization happens after SSL settings are applied
-        deepgram_client = DeepgramClient(api_key)
+        deepgram_client = DeepgramClient(api_key, DEEPGRAM_CLIENT_OPTIONS)
         logger.info("✅ Deepgram client successfully initialized")
     else:
         logger.warning("⚠️ No Deepgram API key found. Transcription will not work.")
@@ -75,7 +116,6 @@ except Exception as e:
 
 class DeepgramService:
     def __init__(self, api_key=None):
-        settings = get_settings()
         self.api_key = api_key or settings.DEEPGRAM_API_KEY
         self.debug = settings.DEBUG
         self._client = None
@@ -91,9 +131,13 @@ class DeepgramService:
         If in debug mode, SSL verification is disabled.
         """
         if not self._client:
+            # Share the module-level client (and its connections) when it uses the same key
+            if deepgram_client and self.api_key == settings.DEEPGRAM_API_KEY:
+                self._client = deepgram_client
+                return self._client
             try:
                 # Create client - SSL verification is already handled at module level
-                self._client = DeepgramClient(self.api_key)
+                self._client = DeepgramClient(self.api_key, DEEPGRAM_CLIENT_OPTIONS)
                 logger.info("✅ Deepgram client successfully initialized")
             except Exception as e:
                 logger.error(f"Failed to initialize Deepgram client: {str(e)}")
@@ -126,15 +170,6 @@ class DeepgramService:
                 logger.error(error_msg)
                 return None, error_msg
             
-            # Configure live transcription options
-            options = LiveOptions(
-                model="nova-2",
-                language="en-US",
-                smart_format=True,
-                interim_results=True,
-                endpointing=True
-            )
-            
             logger.info("Creating Deepgram live transcription connection...")
             
             # Create the live transcription connection
@@ -146,8 +181,12 @@ class DeepgramService:
             connection.on_error = lambda error: callback(f"TRANSCRIPTION_ERROR: {error}")
             connection.on_close = lambda: callback("TRANSCRIPTION_CLOSED")
             
-            # Start the connection
-            await connection.start(options)
+            # Start the connection. The sync client's start() does a blocking
+            # TCP/TLS/WebSocket handshake, so keep it off the event loop.
+            if not await asyncio.to_thread(connection.start, SERVICE_LIVE_OPTIONS):
+                error_msg = "Deepgram live connection did not start"
+                logger.error(error_msg)
+                return None, error_msg
             logger.info("Successfully connected to Deepgram live transcription")
             
             return connection, None
@@ -157,6 +196,22 @@ class DeepgramService:
             logger.error(error_msg)
             return None, error_msg
 
+@lru_cache()
+def get_deepgram_service() -> DeepgramService:
+    """Get the Deepgram service as a singleton shared by all WebSocket connections."""
+    return DeepgramService()
+
+# Display labels for diarized speakers: the first speaker is taken to be the
+# doctor, the second the patient
+SPEAKER_LABELS = {0: "Doctor", 1: "Patient"}
+
+def speaker_label(speaker) -> str:
+    """Return the display label for a diarized speaker number."""
+    return SPEAKER_LABELS.get(speaker, f"Speaker {speaker}")
+
+# Speaker labels already present in transcript text, found in a single scan
+_SPEAKER_LABEL_RE = re.compile(r"\b(?:Doctor|Patient|Speaker [01]):")
+
 # Default transcription parameters - customize based on your medical application needs
 DEFAULT_LIVE_OPTIONS = {
     "model": "nova-2",        # Using nova-2 which is more stable and widely supported
@@ -167,6 +222,18 @@ DEFAULT_LIVE_OPTIONS = {
     "endpointing": True,      # Detect end of speech segments
 }
 
+# LiveOptions are immutable config; build them once instead of per connection
+LIVE_OPTIONS = LiveOptions(**DEFAULT_LIVE_OPTIONS, interim_results=True)
+
+# Options for connections opened through DeepgramService.process_audio_stream
+SERVICE_LIVE_OPTIONS = LiveOptions(
+    model="nova-2",
+    language="en-US",
+    smart_format=True,
+    interim_results=True,
+    endpointing=True
+)
+
 DEFAULT_FILE_OPTIONS = {
     "model": "nova-2",        # Using nova-2 for consistency
     "language": "en-US",
@@ -175,6 +242,83 @@ DEFAULT_FILE_OPTIONS = {
     "punctuate": True,
 }
 
+# DEFAULT_FILE_OPTIONS as /v1/listen query parameters (booleans as "true"/"false")
+_FILE_QUERY_PARAMS = {
+    key: str(value).lower() if isinstance(value, bool) else value
+    for key, value in DEFAULT_FILE_OPTIONS.items()
+}
+
+# Fixed status messages for the client, serialized once
+_START_MESSAGE = orjson.dumps({"event": "start", "message": "Transcription started"}).decode()
+_END_MESSAGE = orjson.dumps({"event": "end", "message": "Transcription completed"}).decode()
+_NOT_CONFIGURED_MESSAGE = orjson.dumps({"event": "error", "message": "Deepgram service is not configured."}).decode()
+
+# Client audio is sent to Deepgram in packets of about this many bytes, and at
+# least every AUDIO_FLUSH_INTERVAL seconds while audio is arriving. 100 ms is
+# well inside Deepgram's endpointing window.
+AUDIO_FLUSH_BYTES = 16 * 1024
+AUDIO_FLUSH_INTERVAL = 0.1
+
+async def _open_live_connection(handlers: Optional[Dict[LiveTranscriptionEvents, Callable]] = None):
+    """
+    Open a Deepgram live connection with LIVE_OPTIONS.
+
+    Args:
+        handlers: Event handlers to register before the connection starts.
+                  The async client calls them as `handler(client, **kwargs)`.
+
+    Returns:
+        The started connection
+
+    Raises:
+        RuntimeError: If Deepgram refuses the connection
+    """
+    connection = deepgram_client.listen.asynclive.v("1")
+    for event, handler in (handlers or {}).items():
+        connection.on(event, handler)
+    if not await connection.start(LIVE_OPTIONS):
+        raise RuntimeError("Deepgram live connection did not start")
+    return connection
+
+# Attempts at opening a live connection before giving up; failed attempts are
+# retried after 1, 2, 4 and then 8 seconds
+DEEPGRAM_CONNECT_RETRIES = int(os.getenv("DEEPGRAM_CONNECT_RETRIES", "5"))
+
+async def _connect_with_backoff(
+    is_active: Callable[[], bool],
+    retries: int = DEEPGRAM_CONNECT_RETRIES,
+    handlers: Optional[Dict[LiveTranscriptionEvents, Callable]] = None,
+):
+    """
+    Open a Deepgram live connection, retrying failures with exponential backoff.
+    The waits are asyncio sleeps, so other connections keep being served while
+    Deepgram is unavailable.
+
+    Args:
+        is_active: Returns False once the connection is no longer wanted (e.g. the client left)
+        retries: Maximum number of attempts
+        handlers: Event handlers registered on each connection before it starts
+
+    Returns:
+        The started connection, or None if `is_active` turned False while retrying
+
+    Raises:
+        The last connection error once every attempt has failed
+    """
+    for attempt in range(retries):
+        try:
+            return await _open_live_connection(handlers)
+        except Exception as e:
+            if attempt == retries - 1:
+                raise
+            delay = min(2 ** attempt, 8)
+            logger.warning(f"Deepgram connection attempt {attempt + 1} failed ({e}); retrying in {delay}s")
+            if not is_active():
+                return None
+            await asyncio.sleep(delay)
+            if not is_active():
+                return None
+
 async def process_audio_stream(websocket: WebSocket, consultation_id: str):
     """
     Process audio data streamed from the client via WebSocket using Deepgram.
@@ -186,179 +330,206 @@ async def process_audio_stream(websocket: WebSocket, consultation_id: str):
     # Check if Deepgram is configured
     if not deepgram_client:
         logger.error("Attempted to use Deepgram service, but API key is not configured.")
-        await websocket.send_json({
-            "event": "error",
-            "message": "Deepgram service is not configured."
-        })
+        await websocket.send_text(_NOT_CONFIGURED_MESSAGE)
         return
         
     try:
         # Log the start of processing
         logger.info(f"Starting Deepgram audio stream processing for consultation {consultation_id}")
+        logger.debug(f"Configured LiveOptions: {LIVE_OPTIONS}")
+        
+        # Connection lifecycle handlers; registered before the connection
+        # starts, so the Open event is seen as well
+        async def on_open(client, **kwargs):
+            logger.info(f"Deepgram connection opened for consultation {consultation_id}")
+        
+        async def on_close(client, **kwargs):
+            logger.info(f"Deepgram connection closed for consultation {consultation_id}")
+        
+        async def on_error(client, error, **kwargs):
+            logger.error(f"Deepgram error: {error}")
+        
+        # Start connecting to Deepgram's live transcription service now, so the
+        # handshake overlaps with the client setting up its audio
+        connect_task = asyncio.create_task(
+            _connect_with_backoff(
+                lambda: websocket.client_state == WebSocketState.CONNECTED,
+                handlers={
+                    LiveTranscriptionEvents.Open: on_open,
+                    LiveTranscriptionEvents.Close: on_close,
+                    LiveTranscriptionEvents.Error: on_error,
+                },
+            )
+        )
         
         # Send start event to the client
-        await websocket.send_json({
-            "event": "start",
-            "message": "Transcription started"
-        })
+        try:
+            await websocket.send_text(_START_MESSAGE)
+        except Exception:
+            connect_task.cancel()
+            raise
         
-        # Create a connection to Deepgram's live transcription service
+        # Wait for the Deepgram connection
         try:
-            # Create options object, ensuring all parameters are properly set
-            live_options = LiveOptions(
-                model=DEFAULT_LIVE_OPTIONS["model"],
-                language=DEFAULT_LIVE_OPTIONS["language"],
-                smart_format=DEFAULT_LIVE_OPTIONS["smart_format"],
-                diarize=DEFAULT_LIVE_OPTIONS["diarize"],
-                punctuate=DEFAULT_LIVE_OPTIONS["punctuate"],
-                endpointing=DEFAULT_LIVE_OPTIONS["endpointing"],
-                interim_results=True
-            )
-            
-            logger.info(f"Configured LiveOptions: {live_options}")
-            
-            # Create the Deepgram connection with simplified setup
             # SSL verification should already be disabled globally if in DEBUG mode
-            connection = deepgram_client.listen.live.v("1").start(live_options)
+            connection = await connect_task
+            if connection is None:
+                logger.info(f"Client left while connecting to Deepgram for consultation {consultation_id}")
+                return
             logger.info("Deepgram live connection created successfully")
             
         except Exception as conn_err:
             logger.error(f"Failed to create Deepgram connection: {conn_err}", exc_info=True)
-            await websocket.send_json({
+            await send_json_fast(websocket, {
                 "event": "error",
                 "message": f"Failed to initialize Deepgram: {str(conn_err)}"
             })
             return
         
-        # Track the final transcription result
+        # Track the final transcription result. Final segments are collected in
+        # a list and joined only when a new one arrives, so interim updates
+        # reuse the joined text instead of rebuilding it.
+        accumulated_parts: List[str] = []
         accumulated_text = ""
         
-        # Set up event listeners for the Deepgram connection using the correct event handling API
-        # For newer versions of the Deepgram SDK, we use the LiveTranscriptionEvents enum
+        # Transcription updates are sent in batches by a separate task rather
+        # than one frame per interim result
+        transcript_updates: asyncio.Queue = asyncio.Queue()
+        flush_task = asyncio.create_task(send_transcription_updates(websocket, transcript_updates))
         
-        # Define the transcript handler as a callback function
-        async def on_transcript(transcript):
+        # Define the transcript handler. The async client calls handlers as
+        # handler(client, result=..., **kwargs).
+        async def on_transcript(client, result, **kwargs):
             nonlocal accumulated_text
+            transcript = result
             try:
-                # Check if transcript has alternatives
-                if transcript and hasattr(transcript, "channel") and hasattr(transcript.channel, "alternatives"):
-                    # Get the transcript text
-                    transcript_text = transcript.channel.alternatives[0].transcript
-                    
-                    # Try to get speaker information if available
+                # Get the transcript text; skip messages without alternatives
+                try:
+                    alt = transcript.channel.alternatives[0]
+                    transcript_text = alt.transcript
+                except (AttributeError, IndexError, TypeError):
+                    return
+                
+                # Try to get speaker information if available, first from the
+                # utterances, then from the alternative's speaker turns
+                speaker_segments = None
+                utterances = getattr(transcript, "utterances", None)
+                if utterances:
+                    logger.debug("Found utterances in transcript")
+                    speaker_segments = [
+                        f"{speaker_label(u.speaker)}: {u.transcript}"
+                        for u in utterances
+                        if getattr(u, "speaker", None) is not None and getattr(u, "transcript", None) is not None
+                    ]
+                else:
+                    speaker_turns = getattr(alt, "speaker_turns", None)
+                    if speaker_turns:
+                        logger.debug("Found speaker_turns in transcript alternative")
+                        speaker_segments = [
+                            f"{speaker_label(t.speaker)}: {t.text}"
+                            for t in speaker_turns
+                            if getattr(t, "speaker", None) is not None and getattr(t, "text", None) is not None
+                        ]
+                
+                if speaker_segments:
+                    speaker_text = " ".join(speaker_segments)
+                    has_speaker_info = True
+                else:
                     speaker_text = transcript_text
-                    has_speaker_info = False
-                    
-                    # First try to get utterances directly from the transcript
-                    if hasattr(transcript, "utterances") and transcript.utterances:
-                        logger.debug("Found utterances in transcript")
-                        speaker_segments = []
-                        for utterance in transcript.utterances:
-                            if hasattr(utterance, "speaker") and hasattr(utterance, "transcript"):
-                                speaker_label = f"Speaker {utterance.speaker}"
-                                # Designate Speaker 0 as Doctor and Speaker 1 as Patient
-                                if utterance.speaker == 0:
-                                    speaker_label = "Doctor"
-                                elif utterance.speaker == 1:
-                                    speaker_label = "Patient"
-                                    
-                                speaker_segments.append(f"{speaker_label}: {utterance.transcript}")
-                        
-                        if speaker_segments:
-                            speaker_text = " ".join(speaker_segments)
-                            has_speaker_info = True
-                    
-                    # Also try to get speaker turns if utterances aren't available
-                    elif hasattr(transcript, "channel") and hasattr(transcript.channel, "alternatives"):
-                        alt = transcript.channel.alternatives[0]
-                        if hasattr(alt, "speaker_turns") and alt.speaker_turns:
-                            logger.debug("Found speaker_turns in transcript alternative")
-                            speaker_segments = []
-                            for turn in alt.speaker_turns:
-                                if hasattr(turn, "speaker") and hasattr(turn, "text"):
-                                    speaker_label = f"Speaker {turn.speaker}"
-                                    # Designate Speaker 0 as Doctor and Speaker 1 as Patient
-                                    if turn.speaker == 0:
-                                        speaker_label = "Doctor"
-                                    elif turn.speaker == 1:
-                                        speaker_label = "Patient"
-                                        
-                                    speaker_segments.append(f"{speaker_label}: {turn.text}")
-                            
-                            if speaker_segments:
-                                speaker_text = " ".join(speaker_segments)
-                                has_speaker_info = True
-                    
                     # Fallback to just parsing the text for speaker labels
-                    elif ":" in transcript_text and \
-                         ("Doctor:" in transcript_text or "Patient:" in transcript_text or 
-                          "Speaker 0:" in transcript_text or "Speaker 1:" in transcript_text):
+                    has_speaker_info = _SPEAKER_LABEL_RE.search(transcript_text) is not None
+                    if has_speaker_info:
                         logger.debug("Found speaker labels in transcript text")
-                        # The text already has speaker labels, so use it directly
-                        speaker_text = transcript_text
-                        has_speaker_info = True
-                    
-                    # Only update and send if there's actual text
-                    if transcript_text:
+                
+                # Only update and send if there's actual text
+                speaker_text = speaker_text.strip()
+                if transcript_text and speaker_text:
+                    if transcript.is_final:
                         # For final results, append to accumulated text
-                        if transcript.is_final:
-                            # If we have speaker information, use that
-                            accumulated_text += speaker_text + " "
-                            
-                        # Send the current state to the client
-                        text_to_send = accumulated_text + (speaker_text if not transcript.is_final else "")
-                        
-                        # Only send if we have text
-                        if text_to_send.strip():
-                            await websocket.send_json({
-                                "event": "transcription",
-                                "text": text_to_send.strip(),
-                                "is_final": transcript.is_final,
-                                "has_speaker_info": has_speaker_info
-                            })
-                            
-                            # Log periodically (not every transcript to avoid flooding)
-                            if transcript.is_final:
-                                logger.debug(f"Sending transcription update: {text_to_send.strip()}")
+                        # (with speaker information, if we have it)
+                        accumulated_parts.append(speaker_text)
+                        accumulated_text = " ".join(accumulated_parts)
+                        text_to_send = accumulated_text
+                    elif accumulated_text:
+                        text_to_send = f"{accumulated_text} {speaker_text}"
+                    else:
+                        text_to_send = speaker_text
+                    
+                    # Send the current state to the client
+                    transcript_updates.put_nowait({
+                        "event": "transcription",
+                        "text": text_to_send,
+                        "is_final": transcript.is_final,
+                        "has_speaker_info": has_speaker_info
+                    })
+                    
+                    # Log periodically (not every transcript to avoid flooding)
+                    if transcript.is_final:
+                        logger.debug("Sending transcription update: %s", text_to_send)
             except Exception as e:
                 logger.error(f"Error handling transcript: {e}")
         
-        # Register event handlers using the correct approach for the current SDK version
-        connection.on_transcript = on_transcript
+        # Register the transcript handler; no transcripts arrive before audio is sent
+        connection.on(LiveTranscriptionEvents.Transcript, on_transcript)
         
-        # Define event handlers for other events
-        connection.on_open = lambda: logger.info(f"Deepgram connection opened for consultation {consultation_id}")
-        connection.on_close = lambda: logger.info(f"Deepgram connection closed for consultation {consultation_id}")
-        connection.on_error = lambda error: logger.error(f"Deepgram error: {error}")
+        # Audio received from the client but not yet sent to Deepgram
+        pending_audio = bytearray()
+        
+        async def flush_audio():
+            if pending_audio:
+                packet = bytes(pending_audio)
+                pending_audio.clear()
+                await connection.send(packet)
+        
+        async def flush_audio_periodically():
+            while True:
+                await asyncio.sleep(AUDIO_FLUSH_INTERVAL)
+                try:
+                    await flush_audio()
+                except Exception as e:
+                    logger.error(f"Error sending buffered audio to Deepgram: {e}")
+        
+        audio_flush_task = asyncio.create_task(flush_audio_periodically())
         
         # Main processing loop to receive audio from the client's browser
         try:
             while True:
-                # Receive binary audio data from the client
-                data = await asyncio.wait_for(websocket.receive_bytes(), timeout=1.0)
+                # Receive binary audio data from the client. This only wakes up
+                # for data or a disconnect, so silence costs nothing.
+                data = await websocket.receive_bytes()
                 
                 # Check if we received end signal
                 if len(data) == 0 or data == b"END_STREAM":
                     logger.info(f"End of audio stream for consultation {consultation_id}")
                     break
                 
-                # Send audio data to Deepgram
-                connection.send(data)
+                # Buffer the audio; send right away only once a full packet has accumulated
+                pending_audio += data
+                if len(pending_audio) >= AUDIO_FLUSH_BYTES:
+                    await flush_audio()
                 
-        except asyncio.TimeoutError:
-            # This is normal when audio is being processed
-            pass
+        except WebSocketDisconnect:
+            logger.info(f"Client disconnected from consultation {consultation_id}")
         except Exception as e:
             logger.error(f"Error while receiving data: {str(e)}")
         finally:
-            # Close the Deepgram connection
+            # Send any audio still buffered, then close the Deepgram connection
+            audio_flush_task.cancel()
+            try:
+                await flush_audio()
+            except Exception as e:
+                logger.error(f"Error sending buffered audio to Deepgram: {e}")
             await connection.finish()
             
+            # Send any transcription updates still queued before the end event
+            transcript_updates.put_nowait(None)
+            try:
+                await flush_task
+            except Exception as flush_error:
+                logger.error(f"Failed to send transcription updates: {flush_error}")
+            
             # Send completion notification
-            await websocket.send_json({
-                "event": "end",
-                "message": "Transcription completed"
-            })
+            await websocket.send_text(_END_MESSAGE)
             logger.info(f"Transcription completed for consultation {consultation_id}")
     
     except Exception as e:
@@ -366,7 +537,7 @@ async def process_audio_stream(websocket: WebSocket, consultation_id: str):
         
         # Send error to client
         try:
-            await websocket.send_json({
+            await send_json_fast(websocket, {
                 "event": "error",
                 "message": f"Transcription error: {str(e)}"
             })
@@ -390,38 +561,39 @@ async def transcribe_audio_file(audio_file: UploadFile) -> Dict[str, Any]:
         logger.error("Attempted to use Deepgram service, but API key is not configured.")
         raise HTTPException(status_code=500, detail="Deepgram service is not configured.")
     
-    temp_file_path = None
-    
     try:
         logger.info(f"Processing audio file: {audio_file.filename}, content type: {audio_file.content_type}")
         
-        # Read the audio file
-        audio_bytes = await audio_file.read()
-        await audio_file.close()
-        
-        # Determine file extension from filename or content_type
-        filename = audio_file.filename or "audio"
-        extension = os.path.splitext(filename)[1] or ".webm"  # Default to .webm if no extension
-        
-        # Create a temporary file
-        with tempfile.NamedTemporaryFile(suffix=extension, delete=False) as tmp:
-            tmp.write(audio_bytes)
-            temp_file_path = tmp.name
-            logger.info(f"Audio saved to temporary file: {temp_file_path}")
+        # Stream the upload straight into the request body in fixed-size chunks,
+        # so the file is never held in memory or copied to disk in full
+        async def upload_chunks():
+            try:
+                while chunk := await audio_file.read(UPLOAD_CHUNK_SIZE):
+                    yield chunk
+            finally:
+                await audio_file.close()
         
-        # Create file source for Deepgram
-        source = FileSource(path=temp_file_path)
+        # Send to Deepgram for transcription, capping how many requests are in flight
+        async with _prerecorded_semaphore:
+            response = await get_http_client().post(
+                DEEPGRAM_LISTEN_URL,
+                params=_FILE_QUERY_PARAMS,
+                headers={
+                    "Authorization": f"Token {settings.DEEPGRAM_API_KEY}",
+                    "Content-Type": audio_file.content_type or "application/octet-stream",
+                },
+                content=upload_chunks(),
+            )
         
-        # Create options for prerecorded transcription
-        options = PrerecordedOptions(**DEFAULT_FILE_OPTIONS)
+        if response.status_code != 200:
+            logger.error(f"Deepgram returned HTTP {response.status_code}: {response.text}")
+            raise HTTPException(status_code=500, detail=f"Failed to get transcription (Deepgram HTTP {response.status_code})")
         
-        # Send to Deepgram for transcription
-        response = await deepgram_client.listen.prerecorded.v("1").transcribe_file(source, options)
+        result = response.json()
         
         # Process the response
-        if response and hasattr(response, "results"):
+        if "results" in result:
             logger.info("Transcription received from Deepgram")
-            result = response.to_dict()  # Convert to dictionary
             
             # Extract and format the result as needed for your application
             # You can customize this based on your specific needs
@@ -430,36 +602,23 @@ async def transcribe_audio_file(audio_file: UploadFile) -> Dict[str, Any]:
                 "segments": []
             }
             
-            # Build a full text with proper speaker labels
-            full_text_with_speakers = ""
-            
             # Extract segments with speaker information if available
             utterances = result.get("results", {}).get("utterances", [])
             if utterances:
-                for utterance in utterances:
-                    speaker_label = f"Speaker {utterance.get('speaker', 0)}"
-                    
-                    # Designate Speaker 0 as Doctor and Speaker 1 as Patient
-                    if utterance.get('speaker') == 0:
-                        speaker_label = "Doctor"
-                    elif utterance.get('speaker') == 1:
-                        speaker_label = "Patient"
-                    
-                    text = utterance.get("transcript", "")
-                    
-                    # Add to full text with proper formatting
-                    full_text_with_speakers += f"{speaker_label}: {text} "
-                    
-                    # Add to segments
-                    formatted_result["segments"].append({
-                        "speaker": speaker_label,
-                        "text": text,
+                formatted_result["segments"] = [
+                    {
+                        "speaker": speaker_label(utterance.get("speaker", 0)),
+                        "text": utterance.get("transcript", ""),
                         "start_time": utterance.get("start", 0),
                         "end_time": utterance.get("end", 0)
-                    })
+                    }
+                    for utterance in utterances
+                ]
                 
-                # Use the formatted text with speakers
-                formatted_result["text"] = full_text_with_speakers.strip()
+                # Build a full text with proper speaker labels
+                formatted_result["text"] = " ".join(
+                    f"{segment['speaker']}: {segment['text']}" for segment in formatted_result["segments"]
+                ).strip()
             else:
                 # Fallback to regular transcript if no speaker information
                 formatted_result["text"] = result.get("results", {}).get("channels", [{}])[0].get("alternatives", [{}])[0].get("transcript", "")
@@ -474,12 +633,4 @@ async def transcribe_audio_file(audio_file: UploadFile) -> Dict[str, Any]:
         if isinstance(e, HTTPException):
             raise e
         raise HTTPException(status_code=500, detail=f"An error occurred during transcription: {str(e)}")
-    
-    finally:
-        # Clean up the temporary file
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.unlink(temp_file_path)
-                logger.info(f"Deleted temporary file: {temp_file_path}")
-            except Exception as e:
-                logger.error(f"Failed to delete temporary file {temp_file_path}: {e}") 
\ No newline at end of file
+ 
\ No newline at end of file
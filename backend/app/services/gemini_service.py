@@ -4,7 +4,7 @@ from app.core.config import settings
 import logging
 from fastapi import UploadFile, HTTPException
 import asyncio # Need to import asyncio
-import tempfile # Import tempfile for creating temporary files
+import io
 import os # Import os for file operations
 
 # Configure logging
@@ -23,6 +23,10 @@ except Exception as e:
     logger.error(f"Failed to configure Gemini API: {e}")
     # Handle configuration error appropriately
 
+# Cap on concurrent transcription requests to Gemini
+GEMINI_MAX_CONCURRENT_REQUESTS = int(os.getenv("GEMINI_MAX_CONCURRENT_REQUESTS", "32"))
+_gemini_semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENT_REQUESTS)
+
 # Define the model to use (Gemini 2.0 Flash)
 # Check the official documentation for the latest recommended model identifier
 # As per https://ai.google.dev/gemini-api/docs/models#gemini-2.0-flash, it's 'gemini-2.0-flash'
@@ -38,6 +42,21 @@ safety_settings = [
     {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
 ]
 
+# The model holds no per-request state, so build it once and reuse it
+_MODEL = genai.GenerativeModel(MODEL_NAME, safety_settings=safety_settings)
+
+# Deletions of uploaded files still in progress; the event loop only keeps
+# weak references to tasks
+_cleanup_tasks = set()
+
+async def _delete_uploaded_file(name: str):
+    """Delete a file uploaded to Gemini, logging rather than raising on failure."""
+    try:
+        logger.info(f"Deleting uploaded file from Gemini: {name}")
+        await asyncio.to_thread(genai.delete_file, name)
+    except Exception as delete_error:
+        logger.error(f"Failed to delete uploaded file {name}: {delete_error}")
+
 async def transcribe_audio_gemini(audio_file: UploadFile) -> str:
     """
     Sends audio data to the Gemini 2.0 Flash model for transcription.
@@ -56,28 +75,21 @@ async def transcribe_audio_gemini(audio_file: UploadFile) -> str:
         raise HTTPException(status_code=500, detail="Gemini API service is not configured.")
 
     uploaded_file_resource = None # Initialize to None to ensure it exists in finally block scope
-    temp_file_path = None # Track the temporary file path
 
     try:
         logger.info(f"Processing audio file: {audio_file.filename}, content type: {audio_file.content_type}")
 
         # --- Gemini API Interaction ---
-        # 1. Read the audio file
-        audio_bytes = await audio_file.read()
-        await audio_file.close() # Ensure the file is closed after reading
-        
-        # The current version of the API doesn't accept bytes directly through 'content' parameter
-        # Instead, we need to write to a temporary file and provide the file path
-        
-        # Determine file extension from filename or content_type
-        filename = audio_file.filename or "audio"
-        extension = os.path.splitext(filename)[1] or ".webm" # Default to .webm if no extension
-        
-        # Create a temporary file
-        with tempfile.NamedTemporaryFile(suffix=extension, delete=False) as tmp:
-            tmp.write(audio_bytes)
-            temp_file_path = tmp.name
-            logger.info(f"Audio saved to temporary file: {temp_file_path}")
+        # 1. Get the audio file
+        # The upload is already spooled by the server (in memory when small, on
+        # disk when large), so hand that file object to the API instead of
+        # copying it into another temporary file
+        await audio_file.seek(0)
+        upload_source = audio_file.file
+        if not isinstance(upload_source, io.IOBase):
+            # SpooledTemporaryFile only subclasses IOBase from Python 3.11;
+            # on older versions pass its underlying file object
+            upload_source = upload_source._file
 
         # Make sure the frontend sends a compatible mime type (e.g., 'audio/webm', 'audio/wav')
         mime_type = audio_file.content_type or "audio/webm" # Example default
@@ -87,36 +99,27 @@ async def transcribe_audio_gemini(audio_file: UploadFile) -> str:
         
         logger.info(f"Uploading audio file with MIME type: {mime_type}")
         
-        # Upload the file - using the correct parameter 'path' instead of 'content'
-        uploaded_file_resource = genai.upload_file(
-            path=temp_file_path, # Use path parameter with the temporary file
-            display_name=audio_file.filename or "consultation_audio",
-            mime_type=mime_type
-        )
-        logger.info(f"Uploaded file '{uploaded_file_resource.display_name}' as: {uploaded_file_resource.uri}")
-
-        # 2. Initialize the generative model
-        model = genai.GenerativeModel(
-            MODEL_NAME,
-            safety_settings=safety_settings
-        )
-
-        # 3. Send the prompt with the audio file URI to the model
-        prompt = [
-            "Please transcribe the following audio recording of a medical consultation accurately.",
-            uploaded_file_resource # Pass the uploaded file object directly
-        ]
-
-        # Try the synchronous method if the async method doesn't work
-        try:
-            # First try the async version
-            response = await model.generate_content_async(prompt, stream=False)
-        except AttributeError:
-            # Fallback to synchronous version if async not available
-            logger.info("Falling back to synchronous generate_content method.")
-            response = model.generate_content(prompt, stream=False)
-
-        # 4. Process the response
+        # Upload and generate under the concurrency cap so request bursts
+        # queue locally instead of overflowing the Gemini API
+        async with _gemini_semaphore:
+            # Upload the file - using the correct parameter 'path' instead of 'content'.
+            # The SDK only has a blocking upload, so run it in a worker thread.
+            uploaded_file_resource = await asyncio.to_thread(
+                genai.upload_file,
+                path=upload_source, # File-like objects are accepted as well as paths
+                display_name=audio_file.filename or "consultation_audio",
+                mime_type=mime_type
+            )
+            logger.info(f"Uploaded file '{uploaded_file_resource.display_name}' as: {uploaded_file_resource.uri}")
+
+            # 2. Send the prompt with the audio file URI to the model
+            prompt = [
+                "Please transcribe the following audio recording of a medical consultation accurately.",
+                uploaded_file_resource # Pass the uploaded file object directly
+            ]
+            response = await _MODEL.generate_content_async(prompt, stream=False)
+
+        # 3. Process the response
         if response and hasattr(response, 'text') and response.text:
             transcription = response.text
             logger.info("Transcription received from Gemini.")
@@ -138,19 +141,12 @@ async def transcribe_audio_gemini(audio_file: UploadFile) -> str:
         raise HTTPException(status_code=500, detail=f"An error occurred during transcription: {str(e)}")
 
     finally:
-        # 5. Clean up resources
-        # Delete the temporary file if it exists
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.unlink(temp_file_path)
-                logger.info(f"Deleted temporary file: {temp_file_path}")
-            except Exception as e:
-                logger.error(f"Failed to delete temporary file {temp_file_path}: {e}")
+        # 4. Clean up resources
+        await audio_file.close()
         
-        # Delete the uploaded file in Gemini if it exists
+        # Delete the uploaded file in Gemini if it exists. The response doesn't
+        # depend on it, so it runs in the background instead of delaying the reply.
         if uploaded_file_resource:
-            try:
-                logger.info(f"Deleting uploaded file from Gemini: {uploaded_file_resource.name}")
-                genai.delete_file(uploaded_file_resource.name)
-            except Exception as delete_error:
-                logger.error(f"Failed to delete uploaded file {uploaded_file_resource.name}: {delete_error}") 
\ No newline at end of file
+            task = asyncio.create_task(_delete_uploaded_file(uploaded_file_resource.name))
+            _cleanup_tasks.add(task)
+            task.add_done_callback(_cleanup_tasks.discard) 
\ No newline at end of file
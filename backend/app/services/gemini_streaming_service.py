@@ -1,8 +1,12 @@
 # backend/app/services/gemini_streaming_service.py
 import google.generativeai as genai
 from app.core.config import settings
+from app.core.websocket import send_json_fast
 import logging
 import asyncio
+import os
+import orjson
+from functools import lru_cache
 from fastapi import WebSocket, HTTPException
 import io
 import wave
@@ -12,18 +16,31 @@ import random
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Configure the Gemini client
-try:
+# Define the model to use for live streaming
+MODEL_NAME = "gemini-2.0-flash"  # Use the experimental flash model for streaming
+
+@lru_cache(maxsize=1)
+def _get_gemini() -> Optional[genai.GenerativeModel]:
+    """
+    Configure the Gemini client and build the streaming model, once per process.
+
+    Returns:
+        The shared model, or None if no Gemini API key is configured
+    """
     if not settings.GEMINI_API_KEY:
         logger.warning("GEMINI_API_KEY not found in settings. Gemini service will not be available.")
-    else:
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        logger.info("Gemini API configured successfully.")
-except Exception as e:
-    logger.error(f"Failed to configure Gemini API: {e}")
+        return None
+    genai.configure(api_key=settings.GEMINI_API_KEY)
+    logger.info("Gemini API configured successfully.")
+    return genai.GenerativeModel(MODEL_NAME)
 
-# Define the model to use for live streaming
-MODEL_NAME = "gemini-2.0-flash"  # Use the experimental flash model for streaming
+# Pause (seconds) after each simulated phrase. Off by default: the pause only
+# holds up the stream and does not model real transcription latency.
+SIM_TYPING_DELAY = float(os.getenv("SIM_TYPING_DELAY", "0.0"))
+
+# Fixed status messages for the client, serialized once
+_START_MESSAGE = orjson.dumps({"event": "start", "message": "Transcription started"}).decode()
+_END_MESSAGE = orjson.dumps({"event": "end", "message": "Transcription completed"}).decode()
 
 # Simulated phrases for more realistic transcription simulation
 SIMULATED_PHRASES = [
@@ -42,6 +59,28 @@ SIMULATED_PHRASES = [
     "Thank you for your time, doctor."
 ]
 
+# The simulated transcript only depends on how many phrases have been sent,
+# so every message is serialized once here. _PHRASE_MESSAGES[i] is the delta
+# for phrase i; _CLOSING_MESSAGES[n] is the closing delta plus the full
+# transcript after n phrases, sent together as one batch frame.
+_PHRASE_MESSAGES = tuple(
+    orjson.dumps({"event": "transcription_delta", "text": phrase, "is_final": True}).decode()
+    for phrase in SIMULATED_PHRASES
+)
+
+def _closing_message(phrase_count: int) -> str:
+    if phrase_count:
+        closing_text = "\nThank you for using our medical consultation service."
+        final_text = " ".join(SIMULATED_PHRASES[:phrase_count]) + closing_text
+    else:
+        closing_text = final_text = "This is a simulated transcription result. In a real implementation, this would be the complete transcription of your speech."
+    return orjson.dumps({"type": "batch", "items": [
+        {"event": "transcription_delta", "text": closing_text, "is_final": True},
+        {"event": "transcription_full", "text": final_text},
+    ]}).decode()
+
+_CLOSING_MESSAGES = tuple(_closing_message(count) for count in range(len(SIMULATED_PHRASES) + 1))
+
 async def process_audio_stream(websocket: WebSocket, consultation_id: str):
     """
     Process audio data streamed from the client via WebSocket.
@@ -55,24 +94,18 @@ async def process_audio_stream(websocket: WebSocket, consultation_id: str):
         logger.info(f"Starting audio stream processing for consultation {consultation_id}")
         
         # Send start event to the client
-        await websocket.send_json({
-            "event": "start",
-            "message": "Transcription started"
-        })
+        await websocket.send_text(_START_MESSAGE)
         logger.info("Sent 'start' event to client")
 
         # Simulate receiving audio and generating transcription
         audio_chunks = []
         current_phrase_index = 0
-        accumulated_text = ""
         chunk_counter = 0
         
-        # Main processing loop
-        while True:
-            try:
-                # Receive binary audio data from the client with a timeout
-                data = await asyncio.wait_for(websocket.receive_bytes(), timeout=1.0)
-                
+        # Main processing loop. iter_bytes waits on the socket itself and ends
+        # quietly when the client disconnects.
+        try:
+            async for data in websocket.iter_bytes():
                 # Check if we received end signal
                 if len(data) == 0 or data == b"END_STREAM":
                     logger.info(f"End of audio stream for consultation {consultation_id}")
@@ -82,52 +115,30 @@ async def process_audio_stream(websocket: WebSocket, consultation_id: str):
                 audio_chunks.append(data)
                 chunk_counter += 1
                 
-                # Send a simulated transcription update more frequently - every 2 chunks
-                if chunk_counter % 2 == 0:
-                    # Add a new phrase from our simulated phrases list
-                    if current_phrase_index < len(SIMULATED_PHRASES):
-                        accumulated_text += SIMULATED_PHRASES[current_phrase_index] + " "
-                        current_phrase_index += 1
-                    
-                    # Log what we're sending to help debug
-                    logger.info(f"Sending transcription update: {accumulated_text}")
+                # Send the next simulated phrase every 2 chunks
+                if chunk_counter % 2 == 0 and current_phrase_index < len(SIMULATED_PHRASES):
+                    # Log what we're sending to help debug (lazily formatted, at
+                    # debug level, since this runs for every phrase)
+                    logger.debug("Sending transcription update %d", current_phrase_index)
                     
-                    # Send the accumulated text as a transcription update
-                    await websocket.send_json({
-                        "event": "transcription",
-                        "text": accumulated_text.strip()
-                    })
+                    # Send just the new phrase; the client appends it
+                    await websocket.send_text(_PHRASE_MESSAGES[current_phrase_index])
+                    current_phrase_index += 1
                     
-                    # Add a small delay to make the simulation more realistic
-                    await asyncio.sleep(0.5)
-            
-            except asyncio.TimeoutError:
-                # This is normal when audio is being processed
-                continue
-            except Exception as e:
-                logger.error(f"Error while receiving data: {str(e)}")
-                break
-        
-        # Complete the transcription with a final message
-        if accumulated_text:
-            final_text = accumulated_text + "\nThank you for using our medical consultation service."
-        else:
-            final_text = "This is a simulated transcription result. In a real implementation, this would be the complete transcription of your speech."
+                    # Optionally pause to make the simulation look more like live typing
+                    if SIM_TYPING_DELAY > 0:
+                        await asyncio.sleep(SIM_TYPING_DELAY)
         
-        # Log the final transcription
-        logger.info(f"Sending final transcription: {final_text}")
+        except Exception as e:
+            logger.error(f"Error while receiving data: {str(e)}")
         
-        # Send the final transcription
-        await websocket.send_json({
-            "event": "transcription",
-            "text": final_text
-        })
+        # Complete the transcription with the closing text, followed by the
+        # full transcript so the client can check what it assembled
+        logger.info(f"Sending final transcription after {current_phrase_index} phrases")
+        await websocket.send_text(_CLOSING_MESSAGES[current_phrase_index])
             
         # Send completion notification
-        await websocket.send_json({
-            "event": "end",
-            "message": "Transcription completed"
-        })
+        await websocket.send_text(_END_MESSAGE)
         logger.info("Sent 'end' event to client")
                 
     except Exception as e:
@@ -138,7 +149,7 @@ async def process_audio_stream(websocket: WebSocket, consultation_id: str):
             error_message = f"Transcription error: {str(e)}"
             logger.error(f"Sending error to client: {error_message}")
             
-            await websocket.send_json({
+            await send_json_fast(websocket, {
                 "event": "error",
                 "message": error_message
             })
@@ -1,16 +1,19 @@
 import logging
 import os
-import json
 import asyncio
 import websockets
-import base64
+from websockets.exceptions import ConnectionClosed, ConnectionClosedError
+import binascii
+import orjson
 import ssl
+import certifi
+import time
 from typing import Dict, Any, Optional, List, Callable
-from fastapi import WebSocket, HTTPException
+from fastapi import WebSocket, WebSocketDisconnect, HTTPException
 
-from app.config import get_settings
 from app.core.config import settings
-from app.ssl_fix import apply_ssl_fixes
+from app.services.connection_pool import ConnectionPool
+from app.core.websocket import TRANSCRIPT_SNAPSHOT_INTERVAL, enqueue_update, send_json_fast, send_transcription_updates
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -19,23 +22,97 @@ logger = logging.getLogger(__name__)
 OPENAI_API_URL = "wss://api.openai.com/v1/audio/transcriptions"
 OPENAI_MODEL = "whisper-1"  # The model to use for transcription
 
-async def process_audio_stream(websocket: WebSocket, consultation_id: str):
+# One TLS context for every OpenAI connection, created once, so the CA bundle
+# isn't loaded again for each connection (websockets builds a fresh default
+# context when none is given). In development mode certificates are not
+# verified; the process-wide SSL fixes are applied once at startup (see app.main).
+if settings.DEBUG:
+    logger.warning("⚠️ DEVELOPMENT MODE: Using unverified SSL context for OpenAI API")
+    _SSL_CONTEXT = ssl.create_default_context()
+    _SSL_CONTEXT.check_hostname = False
+    _SSL_CONTEXT.verify_mode = ssl.CERT_NONE
+else:
+    _SSL_CONTEXT = ssl.create_default_context(cafile=certifi.where())
+
+# Fixed status messages for the client, serialized once
+_START_MESSAGE = orjson.dumps({"event": "start", "message": "Transcription started"}).decode()
+_END_MESSAGE = orjson.dumps({"event": "end", "message": "Transcription completed"}).decode()
+_NOT_CONFIGURED_MESSAGE = orjson.dumps({"event": "error", "message": "OpenAI API key is not configured."}).decode()
+# Queued for the batching writer, so kept as a dict
+_UPSTREAM_DISCONNECTED_MESSAGE = {"event": "error", "message": "OpenAI upstream disconnected"}
+
+# JSON envelope around each base64-encoded audio chunk sent to OpenAI
+_AUDIO_MESSAGE_PREFIX = '{"audio":"'
+_AUDIO_MESSAGE_SUFFIX = '","encoding":"base64"}'
+
+# Maximum number of messages buffered for each client. When a slow client
+# lets the queue fill up, the oldest message is dropped, so the OpenAI reader
+# never waits on the client's socket.
+OUTBOUND_QUEUE_SIZE = 256
+
+# Audio chunks are dropped while more than this many bytes are waiting to be
+# written to OpenAI (about 8 s of 16 kHz 16-bit mono audio once base64-encoded)
+OPENAI_WRITE_BUFFER_LIMIT = 340 * 1024
+
+# Number of OpenAI connections kept open ahead of new WebSocket clients
+OPENAI_PREWARM_CONNECTIONS = int(os.getenv("OPENAI_PREWARM_CONNECTIONS", "2"))
+
+async def open_connection():
+    """
+    Open a WebSocket connection to OpenAI's transcription API.
+
+    Returns:
+        The open connection; the caller is responsible for closing it
+    """
+    # Connect to OpenAI with appropriate SSL settings
+    websocket_options = {
+        "extra_headers": {"Authorization": f"Bearer {settings.OPENAI_API_KEY}"},
+        "ssl": _SSL_CONTEXT,  # Shared context; unverified in development
+        # Ping so a dead upstream is noticed within ~40 s instead of after TCP
+        # retransmission gives up (minutes); this also keeps pooled idle
+        # connections alive
+        "ping_interval": 20,
+        "ping_timeout": 20,
+        "close_timeout": 5,  # Shorter close timeout
+        "max_size": None,  # No limit on message size
+        "max_queue": 32,  # Bound the inbound messages buffered ahead of the receiver
+    }
+    connection_url = f"{OPENAI_API_URL}?model={OPENAI_MODEL}"
+    logger.info(f"Connecting to OpenAI at {connection_url} with DEBUG={settings.DEBUG}")
+    return await websockets.connect(connection_url, **websocket_options)
+
+async def _is_open(connection) -> bool:
+    return connection.close_code is None
+
+async def _close_connection(connection):
+    await connection.close()
+
+def create_connection_pool() -> Optional[ConnectionPool]:
+    """
+    Create the pool of pre-opened OpenAI connections. Called once from the
+    application lifespan; the pool is stored on `app.state.openai_pool`.
+
+    Returns:
+        The connection pool, or None if OpenAI is not configured
+    """
+    if not settings.OPENAI_API_KEY:
+        return None
+    return ConnectionPool(open_connection, _is_open, _close_connection, size=OPENAI_PREWARM_CONNECTIONS, name="OpenAI")
+
+async def process_audio_stream(websocket: WebSocket, consultation_id: str, pool: Optional[ConnectionPool] = None):
     """
     Process audio data streamed from the client via WebSocket using OpenAI's Real-time Transcription API.
     
     Args:
         websocket: The WebSocket connection from the client
         consultation_id: ID of the consultation session
+        pool: Pool of pre-opened OpenAI connections; a new connection is
+              opened directly when not given
     """
-    settings = get_settings()
-    
     # Check if OpenAI API key is configured
     if not settings.OPENAI_API_KEY:
         logger.error("Attempted to use OpenAI service, but API key is not configured.")
-        await websocket.send_json({
-            "event": "error",
-            "message": "OpenAI API key is not configured."
-        })
+        await websocket.send_text(_NOT_CONFIGURED_MESSAGE)
         return
     
     try:
@@ -43,54 +120,30 @@ async def process_audio_stream(websocket: WebSocket, consultation_id: str):
         logger.info(f"Starting OpenAI audio stream processing for consultation {consultation_id}")
         
         # Send start event to the client
-        await websocket.send_json({
-            "event": "start",
-            "message": "Transcription started"
-        })
+        await websocket.send_text(_START_MESSAGE)
         
-        # Create connection to OpenAI's WebSocket API
-        auth_header = f"Bearer {settings.OPENAI_API_KEY}"
-        connection_url = f"{OPENAI_API_URL}?model={OPENAI_MODEL}"
-        
-        # Configure SSL context for the connection
-        ssl_context = None
-        if settings.DEBUG:
-            # Apply SSL fixes and create an unverified context for development
-            logger.warning("⚠️ DEVELOPMENT MODE: Creating unverified SSL context for OpenAI API")
-            # Apply our comprehensive SSL fixes
-            apply_ssl_fixes(debug_mode=True)
+        # Take an already-open connection to OpenAI's WebSocket API from the
+        # pool (or open one now); it is closed when the session ends
+        openai_ws = await pool.acquire() if pool else await open_connection()
+        try:
+            # Track the final segments for the session. The client is sent
+            # each new segment as a delta and builds the transcript itself;
+            # the full text is only joined for the periodic snapshots.
+            accumulated_parts: List[str] = []
+            last_snapshot = time.monotonic()
             
-            # Create an SSL context that doesn't verify certificates in development
-            ssl_context = ssl.create_default_context()
-            ssl_context.check_hostname = False
-            ssl_context.verify_mode = ssl.CERT_NONE
-        
-        # Connect to OpenAI with appropriate SSL settings
-        websocket_options = {
-            "extra_headers": {"Authorization": auth_header},
-            "ssl": ssl_context,  # Use our custom SSL context in development
-            "ping_interval": None,  # Disable ping to avoid any timing issues
-            "ping_timeout": None,  # Disable ping timeout
-            "close_timeout": 10,  # Shorter close timeout
-            "max_size": None,  # No limit on message size
-        }
-        
-        logger.info(f"Connecting to OpenAI at {connection_url} with DEBUG={settings.DEBUG}")
-        
-        async with websockets.connect(
-            connection_url,
-            **websocket_options
-        ) as openai_ws:
-            # Track the accumulated text for the session
-            accumulated_text = ""
+            # Messages for the client are queued and sent in batches by a
+            # writer task, rather than one frame per interim transcription
+            out_queue: asyncio.Queue = asyncio.Queue(maxsize=OUTBOUND_QUEUE_SIZE)
+            writer_task = asyncio.create_task(send_transcription_updates(websocket, out_queue))
             
             # Set up task for receiving from OpenAI
             async def receive_from_openai():
-                nonlocal accumulated_text
+                nonlocal last_snapshot
                 try:
                     async for message in openai_ws:
                         # Parse the response from OpenAI
-                        response = json.loads(message)
+                        response = orjson.loads(message)
                         
                         if "text" in response:
                             # Extract the text from the response
@@ -99,99 +152,127 @@ async def process_audio_stream(websocket: WebSocket, consultation_id: str):
                             
                             # If this is a final segment, append to accumulated text
                             if is_final and transcript_text:
-                                accumulated_text += transcript_text + " "
-                            
-                            # Determine if there's speaker information (if OpenAI provides it)
-                            speaker_text = transcript_text
-                            has_speaker_info = False
+                                accumulated_parts.append(transcript_text)
                             
-                            # Only send if we have text
+                            # Only send if we have text. An interim delta replaces the
+                            # segment in progress; a final one is appended for good.
                             if transcript_text.strip():
-                                await websocket.send_json({
-                                    "event": "transcription",
-                                    "text": accumulated_text + (transcript_text if not is_final else ""),
+                                enqueue_update(out_queue, {
+                                    "event": "transcription_delta",
+                                    "text": transcript_text,
                                     "is_final": is_final,
-                                    "has_speaker_info": has_speaker_info
+                                    "has_speaker_info": False
                                 })
                                 
-                                # Log periodically
-                                if is_final and transcript_text:
-                                    logger.debug(f"Transcription: {transcript_text}")
+                                # Send the whole transcript now and then, so a client
+                                # that missed a delta can resync
+                                if is_final and time.monotonic() - last_snapshot >= TRANSCRIPT_SNAPSHOT_INTERVAL:
+                                    last_snapshot = time.monotonic()
+                                    enqueue_update(out_queue, {
+                                        "event": "transcription_full",
+                                        "text": " ".join(accumulated_parts)
+                                    })
+                                
+                                # Log final segments; lazy formatting, so nothing is
+                                # built unless debug logging is on
+                                if is_final:
+                                    logger.debug("Transcription: %s", transcript_text)
                         
                         elif "error" in response:
                             # Handle error messages from OpenAI
                             error_msg = response.get("error", {}).get("message", "Unknown error")
                             logger.error(f"OpenAI transcription error: {error_msg}")
-                            await websocket.send_json({
+                            enqueue_update(out_queue, {
                                 "event": "error",
                                 "message": f"Transcription error: {error_msg}"
                             })
+                except ConnectionClosedError as e:
+                    # Abnormal close, e.g. a ping went unanswered
+                    logger.error(f"OpenAI connection lost for consultation {consultation_id}: {e}")
+                    enqueue_update(out_queue, _UPSTREAM_DISCONNECTED_MESSAGE)
                 except Exception as e:
                     logger.error(f"Error receiving from OpenAI: {str(e)}")
-                    await websocket.send_json({
+                    enqueue_update(out_queue, {
                         "event": "error",
                         "message": f"Error receiving from OpenAI: {str(e)}"
                     })
             
             # Set up task for sending to OpenAI
             async def send_to_openai():
+                dropped_chunks = 0
                 try:
                     while True:
-                        # Receive binary audio data from client
-                        data = await asyncio.wait_for(websocket.receive_bytes(), timeout=1.0)
+                        # Receive binary audio data from client. No timeout: the
+                        # wait ends on data or a disconnect, without a task per chunk.
+                        data = await websocket.receive_bytes()
                         
                         # Check if we received end signal
                         if len(data) == 0 or data == b"END_STREAM":
                             logger.info(f"End of audio stream for consultation {consultation_id}")
                             break
                         
-                        # Prepare audio data according to OpenAI's requirements
-                        # We need to encode as base64 if OpenAI expects it
-                        audio_message = {
-                            "audio": base64.b64encode(data).decode('utf-8'),
-                            "encoding": "base64"
-                        }
+                        # When OpenAI falls behind, drop audio rather than buffer it
+                        # without bound; for live transcription catching up matters
+                        # more than every chunk
+                        if openai_ws.transport.get_write_buffer_size() > OPENAI_WRITE_BUFFER_LIMIT:
+                            dropped_chunks += 1
+                            if dropped_chunks % 50 == 1:
+                                logger.warning(f"OpenAI is lagging; dropped {dropped_chunks} audio chunks for consultation {consultation_id}")
+                            continue
+                        
+                        # Prepare audio data according to OpenAI's requirements: the
+                        # API only takes JSON text frames, so the audio has to be
+                        # base64. The envelope is fixed, so the message is built
+                        # around the encoded audio (which needs no JSON escaping).
+                        audio_message = _AUDIO_MESSAGE_PREFIX + binascii.b2a_base64(data, newline=False).decode("ascii") + _AUDIO_MESSAGE_SUFFIX
                         
                         # Send to OpenAI
-                        await openai_ws.send(json.dumps(audio_message))
-                except asyncio.TimeoutError:
-                    # This is normal when audio is being processed
-                    pass
+                        await openai_ws.send(audio_message)
+                except WebSocketDisconnect:
+                    logger.info(f"Client disconnected from consultation {consultation_id}")
+                except ConnectionClosed:
+                    # The receiver reports the lost connection to the client
+                    logger.warning(f"OpenAI connection closed while sending audio for consultation {consultation_id}")
                 except Exception as e:
                     logger.error(f"Error sending to OpenAI: {str(e)}")
                     raise
             
-            # Run both tasks concurrently
+            # Receive from OpenAI in a task while this one forwards the audio
             try:
-                # Create tasks for sending and receiving
-                send_task = asyncio.create_task(send_to_openai())
                 receive_task = asyncio.create_task(receive_from_openai())
-                
-                # Wait for the send task to complete (when the client stops sending)
-                await send_task
-                
-                # Cancel the receive task
-                receive_task.cancel()
                 try:
-                    await receive_task
-                except asyncio.CancelledError:
-                    pass
+                    # Returns when the client stops sending
+                    await send_to_openai()
+                finally:
+                    # Stop the receiver too, also when sending failed
+                    receive_task.cancel()
+                    await asyncio.gather(receive_task, return_exceptions=True)
             except Exception as e:
                 logger.error(f"Error in OpenAI WebSocket communication: {str(e)}")
             finally:
-                # Send completion notification
-                await websocket.send_json({
-                    "event": "end",
-                    "message": "Transcription completed"
-                })
+                # Send the queued messages and a last full snapshot, then the
+                # completion notification
+                if accumulated_parts:
+                    enqueue_update(out_queue, {
+                        "event": "transcription_full",
+                        "text": " ".join(accumulated_parts)
+                    })
+                enqueue_update(out_queue, None)
+                try:
+                    await writer_task
+                except Exception as e:
+                    logger.error(f"Failed to send transcription updates: {str(e)}")
+                await websocket.send_text(_END_MESSAGE)
                 logger.info(f"Transcription completed for consultation {consultation_id}")
+        finally:
+            await openai_ws.close()
                 
     except Exception as e:
         logger.error(f"Error in OpenAI streaming for {consultation_id}: {e}", exc_info=True)
         
         # Send error to client
         try:
-            await websocket.send_json({
+            await send_json_fast(websocket, {
                 "event": "error",
                 "message": f"Transcription error: {str(e)}"
             })
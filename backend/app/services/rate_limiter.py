@@ -0,0 +1,47 @@
+# backend/app/services/rate_limiter.py
+import asyncio
+
+class AsyncRateLimiter:
+    """
+    Token-bucket pacer allowing at most `rate` acquisitions per `period`
+    seconds, with bursts of up to `rate`. Callers over the limit wait their
+    turn, in arrival order, instead of being rejected.
+
+    Usage:
+        async with limiter:
+            await call_rate_limited_api()
+    """
+
+    def __init__(self, rate: float, period: float = 60.0):
+        """
+        Args:
+            rate: Number of acquisitions allowed per period
+            period: Length of the period in seconds
+        """
+        self.rate = rate
+        self.period = period
+        self._tokens = float(rate)
+        self._updated: float | None = None
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a token is available and take it."""
+        # The lock queues waiters so tokens are handed out first come, first served
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            while True:
+                now = loop.time()
+                if self._updated is not None:
+                    self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate / self.period)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) * self.period / self.rate)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
@@ -59,10 +59,6 @@ async def transcribe_audio(
         # In a real implementation, store this in database
         # db.transcriptions.insert_one(simulated_result)
         
-        # Clean up temp file
-        if os.path.exists(audio_file_path):
-            os.remove(audio_file_path)
-        
         return simulated_result
         
     except Exception as e:
@@ -77,8 +73,11 @@ async def transcribe_audio(
         # In a real implementation, store this in database
         # db.transcriptions.insert_one(error_result)
         
-        # Clean up temp file
-        if os.path.exists(audio_file_path):
+        return error_result
+    
+    finally:
+        # Clean up temp file (a single unlink; it may already be gone)
+        try:
             os.remove(audio_file_path)
-        
-        return error_result 
\ No newline at end of file
+        except FileNotFoundError:
+            pass 
\ No newline at end of file
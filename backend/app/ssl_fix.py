@@ -9,6 +9,8 @@ It applies several fixes:
 2. Adds macOS-specific fixes
 3. Configures urllib3 to use the correct certificates
 4. Patches SSL context creation to accept self-signed certificates in development mode
+
+For unverified requests calls in development, use InsecureSession.
 """
 
 import os
@@ -18,10 +20,31 @@ import ssl
 import certifi
 import urllib3
 import requests
-from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# Modes (debug or not) the fixes have already been applied for. The fixes are
+# process-wide, so applying them again would only repeat the work.
+_applied_modes = set()
+
+class InsecureSession(requests.Session):
+    """
+    A requests session that skips certificate verification, for development
+    only. Use it explicitly where unverified requests are needed, rather than
+    patching every session in the process.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.verify = False
+
+    def merge_environment_settings(self, url, proxies, stream, verify, cert):
+        # requests lets REQUESTS_CA_BUNDLE (set by apply_ssl_fixes) override a
+        # session-level verify=False, so force it here
+        settings = super().merge_environment_settings(url, proxies, stream, verify, cert)
+        settings['verify'] = False
+        return settings
+
 def apply_ssl_fixes(debug_mode=None):
     """
     Apply comprehensive SSL fixes to ensure API connections work properly.
@@ -34,6 +57,10 @@ def apply_ssl_fixes(debug_mode=None):
     if debug_mode is None:
         debug_mode = os.environ.get('DEBUG', 'False').lower() in ('true', '1', 't')
     
+    if debug_mode in _applied_modes:
+        return
+    _applied_modes.add(debug_mode)
+    
     logger.info(f"Applying SSL fixes (Debug mode: {debug_mode})")
     
     # 1. Set certificate paths using certifi
@@ -62,15 +89,9 @@ def _apply_macos_fixes(cert_path):
     """Apply macOS-specific certificate fixes."""
     logger.info("Applying macOS-specific SSL fixes")
     
-    # Try to find and run the macOS certificate installer if needed
-    for version in ["3.11", "3.10", "3.9", "3.8", "3.7"]:
-        cert_command = Path(f"/Applications/Python {version}/Install Certificates.command")
-        if cert_command.exists():
-            logger.info(f"Found certificate installer at {cert_command}")
-            # We don't actually run it here as it might require user interaction
-            # Instead we've already set the paths using certifi
-            break
-            
+    # The certificate paths were already pointed at certifi, which is what
+    # the python.org "Install Certificates.command" would set up
+    
     # Set OpenSSL environment variables
     os.environ['OPENSSL_CONF'] = ''
 
@@ -81,17 +102,8 @@ def _apply_development_mode_fixes():
     # 1. Set environment variable to disable Python's HTTPS verification
     os.environ['PYTHONHTTPSVERIFY'] = '0'
     
-    # 2. Disable verification for the requests library
-    old_merge_environment_settings = requests.Session.merge_environment_settings
-    
-    def new_merge_environment_settings(self, url, proxies, stream, verify, cert):
-        settings = old_merge_environment_settings(self, url, proxies, stream, verify, cert)
-        settings['verify'] = False
-        return settings
-    
-    requests.Session.merge_environment_settings = new_merge_environment_settings
-    
-    # 3. Patch the default SSL context
+    # 2. Patch the default SSL context. The requests library is left alone;
+    # code that needs unverified requests uses InsecureSession.
     try:
         _create_default_https_context = ssl._create_default_https_context
         ssl._create_default_https_context = ssl._create_unverified_context
@@ -99,7 +111,7 @@ def _apply_development_mode_fixes():
     except AttributeError:
         logger.warning("Could not patch ssl._create_default_https_context")
     
-    # 4. Configure urllib3 to disable warnings
+    # 3. Configure urllib3 to disable warnings
     urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 # If this module is run directly, apply SSL fixes
@@ -177,6 +177,10 @@ function ConsultationWorkspace() {
   const processorNodeRef = useRef<ScriptProcessorNode | null>(null);
   const audioProcessingRef = useRef<{audioContext: AudioContext | null, stopProcessing: () => void} | null>(null);
   const currentLineIdRef = useRef<number>(0);
+  // Source of transcript line ids (React keys). Date.now() repeats when one
+  // batched frame appends several lines in the same tick.
+  const transcriptLineIdRef = useRef<number>(0);
+  const nextTranscriptLineId = () => ++transcriptLineIdRef.current;
   const recordingTimerRef = useRef<number | null>(null);
   
   // After recording stops, automatically switch to analysis tab
@@ -635,69 +639,79 @@ function ConsultationWorkspace() {
             return;
           }
           
-          // Parse incoming data as JSON
-          const data = JSON.parse(event.data);
-          console.log("Received WebSocket message:", data);
+          // Parse incoming data as JSON. The server may combine several
+          // messages into a single "batch" frame.
+          const parsed = JSON.parse(event.data);
+          const messages = parsed.type === "batch" ? parsed.items : [parsed];
+
+          for (const data of messages) {
+            console.log("Received WebSocket message:", data);
           
-          if (data.type === "transcript") {
-            // Use the received speaker number (defaulting to 0 if missing)
-            const speakerNumber = typeof data.speaker === 'number' ? data.speaker : 0;
-            // Create a display label (e.g., "Speaker 1", "Speaker 2")
-            const speakerLabel = `Speaker ${speakerNumber + 1}`;
+            if (data.type === "transcript") {
+              // Use the received speaker number (defaulting to 0 if missing)
+              const speakerNumber = typeof data.speaker === 'number' ? data.speaker : 0;
+              // Create a display label (e.g., "Speaker 1", "Speaker 2")
+              const speakerLabel = `Speaker ${speakerNumber + 1}`;
             
-            setTranscript(prev => [...prev, { 
-              id: Date.now(), 
-              text: data.text,
-              speaker: speakerLabel,
-              timestamp: new Date().toISOString()
-            }]);
-          } else if (data.type === "analysis") {
-            // Handle analysis data from backend
-            if (data.data && typeof data.data === 'object') {
-               console.log("Received analysis data:", data.data);
-               // Update state with received analysis, providing defaults for new structure
-               setAnalysis({
-                   symptoms: data.data.symptoms || [],
-                   suggestions: data.data.suggestions || [],
-                   severity: data.data.severity || { level: "Low", rationale: "" },
-                   diagnoses: data.data.diagnoses || []
-               });
-            } else {
-                console.warn("Received analysis message with invalid data structure:", data);
-            }
-          } else if (data.type === "error") {
-            // Handle error messages from backend/Deepgram
-            console.error("Received error message:", data.message);
-            setError(`Error: ${data.message}`);
-          } else if (data.status === "ready" || data.type === "status") {
-            // Handle ready status
-            console.log("Transcription service status:", data.message || "Ready");
-          } else if (data.event === "transcription") {
-            // Handle event-based transcription format
-            console.log("Received transcription event:", data.text);
+              setTranscript(prev => [...prev, { 
+                id: nextTranscriptLineId(), 
+                text: data.text,
+                speaker: speakerLabel,
+                timestamp: new Date().toISOString()
+              }]);
+            } else if (data.type === "analysis") {
+              // Handle analysis data from backend
+              if (data.data && typeof data.data === 'object') {
+                 console.log("Received analysis data:", data.data);
+                 // Update state with received analysis, providing defaults for new structure
+                 setAnalysis({
+                     symptoms: data.data.symptoms || [],
+                     suggestions: data.data.suggestions || [],
+                     severity: data.data.severity || { level: "Low", rationale: "" },
+                     diagnoses: data.data.diagnoses || []
+                 });
+              } else {
+                  console.warn("Received analysis message with invalid data structure:", data);
+              }
+            } else if (data.type === "analysis_partial") {
+              // Symptoms streamed ahead of the full analysis; keep the rest until it arrives
+              if (data.data && Array.isArray(data.data.symptoms)) {
+                 setAnalysis(prev => ({ ...prev, symptoms: data.data.symptoms }));
+              }
+            } else if (data.type === "error") {
+              // Handle error messages from backend/Deepgram
+              console.error("Received error message:", data.message);
+              setError(`Error: ${data.message}`);
+            } else if (data.status === "ready" || data.type === "status") {
+              // Handle ready status
+              console.log("Transcription service status:", data.message || "Ready");
+            } else if (data.event === "transcription") {
+              // Handle event-based transcription format
+              console.log("Received transcription event:", data.text);
             
-            // Check if data has speaker info
-            const speaker = data.speaker || extractSpeakerFromText(data.text);
+              // Check if data has speaker info
+              const speaker = data.speaker || extractSpeakerFromText(data.text);
             
-            setTranscript(prev => [...prev, { 
-              id: Date.now(), 
-              text: removeSpeakerPrefix(data.text), 
-              speaker: speaker,
-              timestamp: new Date().toISOString()
-            }]);
-          } else if (data.text) {
-            // Fallback for other text formats
-            console.log("Received text data:", data.text);
+              setTranscript(prev => [...prev, { 
+                id: nextTranscriptLineId(), 
+                text: removeSpeakerPrefix(data.text), 
+                speaker: speaker,
+                timestamp: new Date().toISOString()
+              }]);
+            } else if (data.text) {
+              // Fallback for other text formats
+              console.log("Received text data:", data.text);
             
-            // Check if data has speaker info
-            const speaker = data.speaker || extractSpeakerFromText(data.text);
+              // Check if data has speaker info
+              const speaker = data.speaker || extractSpeakerFromText(data.text);
             
-            setTranscript(prev => [...prev, { 
-              id: Date.now(), 
-              text: removeSpeakerPrefix(data.text), 
-              speaker: speaker,
-              timestamp: new Date().toISOString()
-            }]);
+              setTranscript(prev => [...prev, { 
+                id: nextTranscriptLineId(), 
+                text: removeSpeakerPrefix(data.text), 
+                speaker: speaker,
+                timestamp: new Date().toISOString()
+              }]);
+            }
           }
         } catch (error) {
           console.error("Error processing WebSocket message:", error);
@@ -819,7 +833,7 @@ function ConsultationWorkspace() {
     const interval = setInterval(() => {
       if (index < mockConversation.length) {
         setTranscript(prev => [...prev, { 
-          id: Date.now(), 
+          id: nextTranscriptLineId(), 
           text: mockConversation[index].text,
           speaker: mockConversation[index].speaker,
           timestamp: new Date().toISOString()